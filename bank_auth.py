@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMES = ("pbkdf2_sha256", "scrypt")
+
+def derive(scheme, password, salt, params):
+    # Module-level so it can run in a ProcessPoolExecutor worker
+    if scheme == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params[0])
+    if scheme == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+    raise ValueError(f"Unknown password scheme {scheme}")
+
+# Salted password hashes stored as "scheme$param...$salt$hash". Hashes in the
+# legacy format (bare unsalted SHA-256 hex) still verify and are reported by
+# needs_upgrade so they can be replaced on the next successful login.
+class PasswordHasher:
+    def __init__(self, scheme="pbkdf2_sha256", iterations=260000, scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 executor=None):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Password scheme must be one of {', '.join(SCHEMES)}")
+        self.scheme = scheme
+        self.params = (iterations,) if scheme == "pbkdf2_sha256" else (scrypt_n, scrypt_r, scrypt_p)
+        self.prefix = "$".join([scheme, *map(str, self.params)]) + "$"
+        self.executor = executor
+
+    def derive(self, scheme, password, salt, params):
+        if self.executor:
+            return self.executor.submit(derive, scheme, password, salt, params).result()
+        return derive(scheme, password, salt, params)
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        return self.prefix + salt.hex() + "$" + self.derive(self.scheme, password, salt, self.params).hex()
+
+    def verify(self, password, encoded):
+        if "$" not in encoded:
+            return hmac.compare_digest(encoded, hashlib.sha256(password.encode()).hexdigest())
+        scheme, *params, salt, expected = encoded.split("$")
+        digest = self.derive(scheme, password, bytes.fromhex(salt), tuple(int(param) for param in params))
+        return hmac.compare_digest(digest, bytes.fromhex(expected))
+
+    def needs_upgrade(self, encoded):
+        return not encoded.startswith(self.prefix)
+
+default_hasher = PasswordHasher()
+
+# Session tokens issued on login. Lookups are a dict hit; sessions expire
+# after ttl seconds of inactivity and the least recently used are evicted
+# once max_sessions is reached.
+class SessionCache:
+    def __init__(self, ttl=900, max_sessions=100000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def issue(self, id_number):
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions[token] = (id_number, time.monotonic() + self.ttl)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return token
+
+    def lookup(self, token):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.sessions.get(token)
+            if entry is None:
+                return None
+            if entry[1] < now:
+                del self.sessions[token]
+                return None
+            self.sessions[token] = (entry[0], now + self.ttl)
+            self.sessions.move_to_end(token)
+            return entry[0]
+
+    def revoke(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    def revoke_account(self, id_number):
+        with self.lock:
+            for token in [token for token, entry in self.sessions.items() if entry[0] == id_number]:
+                del self.sessions[token]
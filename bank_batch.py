@@ -0,0 +1,79 @@
+# Headless bulk posting of deposits, withdrawals and transfers from a CSV or JSONL file
+#   python bank_batch.py nightly.csv --batch-size 5000 --rejections rejected.csv
+# CSV files need an id_number,operation,amount[,to_id_number] header; JSONL files hold one
+# {"id_number": ..., "operation": "deposit" | "withdraw" | "transfer", "amount": ...} object per line,
+# where transfers also name the receiving account as "to_id_number"
+import argparse
+import csv
+import itertools
+import json
+import time
+
+import bank_metrics
+from bank_core import BankSystem, StoreInUseException
+
+def read_operations(path, file_format):
+    with open(path, "r", newline="") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield {}
+
+def batch_size(value):
+    size = int(value)
+    if size < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description="Post a file of deposits, withdrawals and transfers")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=batch_size, default=1000, help="rows per journal commit")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--lazy", action="store_true", help="load only the accounts the file touches")
+    parser.add_argument("--rejections", default="rejections.csv", help="per-row rejection report")
+    parser.add_argument("--metrics", help="write operation metrics in Prometheus text format to this file")
+    parser.add_argument("--profile", help="write sampled stacks in collapsed (flamegraph) format to this file")
+    args = parser.parse_args()
+    file_format = args.format or ("jsonl" if args.path.endswith((".jsonl", ".json")) else "csv")
+    metrics = bank_metrics.enable() if args.metrics else None
+    profiler = bank_metrics.Profiler(args.profile).start() if args.profile else None
+
+    try:
+        bank = BankSystem(args.data_dir, lazy=args.lazy)
+    except StoreInUseException as e:
+        raise SystemExit(f"{e}; stop it before posting a batch")
+    operations = read_operations(args.path, file_format)
+    applied = rejected = 0
+    start = time.perf_counter()
+    with open(args.rejections, "w", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(["Row", "Reason"])
+        row_number = 1
+        while True:
+            chunk = list(itertools.islice(operations, args.batch_size))
+            if not chunk:
+                break
+            chunk_applied, rejections = bank.post_batch(chunk, args.batch_size, row_number)
+            applied += chunk_applied
+            rejected += len(rejections)
+            writer.writerows(rejections)
+            row_number += len(chunk)
+    elapsed = time.perf_counter() - start
+    bank.close()
+    if profiler:
+        profiler.stop()
+    if metrics:
+        metrics.write_prometheus(args.metrics)
+    rows = applied + rejected
+    print(f"Posted {applied} rows, rejected {rejected} (see {args.rejections})")
+    print(f"{rows} rows in {elapsed:.2f}s: {rows / elapsed if elapsed else 0:,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
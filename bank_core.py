@@ -0,0 +1,1142 @@
+# Banking core: exceptions, transactions, accounts and BankSystem. It imports
+# no GUI toolkit, so servers, batch jobs and workers load it without a display;
+# the Tkinter app in bankingSimulation.py is built on top of it.
+import os
+import glob
+import math
+from array import array
+from collections.abc import MutableMapping, Sequence
+from datetime import datetime
+import csv
+import threading
+import time
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+from bank_auth import SessionCache, default_hasher
+from bank_index import AccountIndex
+from bank_journal import Journal
+from bank_numbers import AccountNumberAllocator
+from bank_snapshot import Snapshot, migrate_text_data, records_path, to_epoch, from_epoch
+
+# Custom Exceptions
+class BankingException(Exception):
+    pass
+
+class InvalidDepositAmountException(BankingException):
+    pass
+
+class InvalidWithdrawalAmountException(BankingException):
+    pass
+
+class InsufficientFundsException(BankingException):
+    pass
+
+class AccountLockedException(BankingException):
+    pass
+
+class InvalidIDException(BankingException):
+    pass
+
+class MinimumInitialDepositException(BankingException):
+    pass
+
+class AccountNotFoundException(BankingException):
+    pass
+
+class InvalidAccountTypeException(BankingException):
+    pass
+
+class InvalidPasswordException(BankingException):
+    pass
+
+class InterestAlreadyAppliedException(BankingException):
+    pass
+
+class InvalidOperationException(BankingException):
+    pass
+
+class InvalidSessionException(BankingException):
+    pass
+
+class AccountNumbersExhaustedException(BankingException):
+    pass
+
+class StoreInUseException(BankingException):
+    pass
+
+def whole_filler(amount):
+    # Transactions keep amounts in fillér (1/100 HUF); a finer amount would be
+    # rounded in the log but not in the balance
+    return round(amount, 2) == amount
+
+def valid_text(value):
+    # Snapshot string columns are NUL-separated
+    return isinstance(value, str) and "\0" not in value
+
+def current_period():
+    return datetime.now().strftime("%Y-%m")
+
+def lock_store(data_dir):
+    # One read-write BankSystem per store: a second writer would cut the live
+    # journal's tail, delete the live record file and reuse journal sequence
+    # numbers. The lock is released when the returned file is closed.
+    f = open(os.path.join(data_dir, "bank.lock"), "a+b")
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        raise StoreInUseException(f"The store in {data_dir} is open in another process")
+    return f
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+# Transaction Class
+# Transactions are stored compactly: interned type/description codes, the
+# amount in integer fillér (1/100 HUF) and the timestamp as UTC epoch seconds
+class Transaction:
+    __slots__ = ("type_code", "amount_minor", "epoch", "description_code")
+    types = []
+    descriptions = []
+    type_codes = {}
+    description_codes = {}
+    intern_lock = threading.Lock()
+
+    def __init__(self, trans_type, amount, description):
+        self.trans_type = trans_type
+        self.amount = amount
+        self.epoch = int(time.time())
+        self.description = description
+
+    @staticmethod
+    def intern(table, codes, value):
+        code = codes.get(value)
+        if code is None:
+            with Transaction.intern_lock:
+                code = codes.get(value)
+                if code is None:
+                    table.append(value)
+                    code = codes[value] = len(table) - 1
+        return code
+
+    @property
+    def trans_type(self):
+        return Transaction.types[self.type_code]
+
+    @trans_type.setter
+    def trans_type(self, value):
+        self.type_code = Transaction.intern(Transaction.types, Transaction.type_codes, value)
+
+    @property
+    def description(self):
+        return Transaction.descriptions[self.description_code]
+
+    @description.setter
+    def description(self, value):
+        self.description_code = Transaction.intern(Transaction.descriptions, Transaction.description_codes, value)
+
+    @property
+    def amount(self):
+        return self.amount_minor / 100
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = round(value * 100)
+
+    @property
+    def timestamp(self):
+        return from_epoch(self.epoch)
+
+    @timestamp.setter
+    def timestamp(self, value):
+        self.epoch = to_epoch(value)
+
+    def __str__(self):
+        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {self.trans_type} | {self.amount} HUF | {self.description}"
+
+    def to_dict(self):
+        return {
+            "type": self.trans_type,
+            "amount": self.amount,
+            "timestamp": self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            "description": self.description,
+            "epoch": self.epoch
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # The local timestamp is ambiguous in the hour a DST change repeats, so
+        # it is rebuilt from the epoch
+        trans = cls(data["type"], data["amount"], data["description"])
+        trans.epoch = data["epoch"]
+        return trans
+
+    @classmethod
+    def restore(cls, trans_type, amount, epoch, description):
+        # Rebuilds a stored transaction without reading the clock
+        trans = cls.__new__(cls)
+        trans.trans_type = trans_type
+        trans.amount = amount
+        trans.epoch = epoch
+        trans.description = description
+        return trans
+
+# Lazy transaction history: records stored in the snapshot's record file are
+# decoded on access, transactions made since the last compaction stay in memory
+class TransactionLog(Sequence):
+    __slots__ = ("source", "offset", "stored", "recent", "ordered")
+
+    def __init__(self, transactions=None, source=None, offset=0, stored=0):
+        self.source = source
+        self.offset = offset
+        self.stored = stored
+        self.recent = list(transactions) if transactions else []
+        # Whether the epochs never decrease; None until a range query checks
+        self.ordered = None
+
+    def __len__(self):
+        return self.stored + len(self.recent)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        if index >= self.stored:
+            return self.recent[index - self.stored]
+        trans_type, amount, timestamp, description = self.source.record(self.offset + index)
+        return Transaction.restore(trans_type, amount, timestamp, description)
+
+    def __iter__(self):
+        for i in range(self.stored):
+            yield self[i]
+        yield from self.recent
+
+    def __reversed__(self):
+        yield from reversed(self.recent)
+        for i in range(self.stored - 1, -1, -1):
+            yield self[i]
+
+    def append(self, trans):
+        if self.ordered and len(self) and trans.epoch < self.epoch_at(len(self) - 1):
+            self.ordered = False
+        self.recent.append(trans)
+
+    def epoch_at(self, index):
+        if index >= self.stored:
+            return self.recent[index - self.stored].epoch
+        return self.source.epoch(self.offset + index)
+
+    def is_ordered(self):
+        # History is appended in time order unless the clock was stepped back
+        # between two transactions; checked once, then kept up by append
+        if self.ordered is None:
+            self.ordered = all(self.epoch_at(i - 1) <= self.epoch_at(i) for i in range(1, len(self)))
+        return self.ordered
+
+    def window(self, start, end):
+        # Indexes of the transactions with start <= epoch < end, in history
+        # order: binary searched in an ordered history, scanned otherwise
+        if self.is_ordered():
+            return range(self.bisect(start) if start is not None else 0,
+                         self.bisect(end) if end is not None else len(self))
+        return [i for i in range(len(self))
+                if (start is None or self.epoch_at(i) >= start) and (end is None or self.epoch_at(i) < end)]
+
+    def bisect(self, epoch):
+        # First transaction at or after epoch; in an ordered history a binary
+        # search over the stored timestamps, and every later one is too
+        if not self.is_ordered():
+            return next((i for i in range(len(self)) if self.epoch_at(i) >= epoch), len(self))
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.epoch_at(middle) < epoch:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def rebind(self, source, offset):
+        # Called after compaction has written every transaction to a new record file
+        self.stored = len(self)
+        self.source = source
+        self.offset = offset
+        self.recent = []
+
+# Savings Account Base Class
+class SavingsAccount:
+    __slots__ = ("id_number", "name", "balance", "account_number", "account_type", "password_hash",
+                 "transaction_log", "failed_withdrawals", "is_locked", "interest_period")
+    interest_rate = None
+    interest_description = None
+
+    def __init__(self, id_number, name, initial_deposit, account_type, password, password_hasher=default_hasher):
+        if initial_deposit < 1000:
+            raise MinimumInitialDepositException("Initial deposit must be at least 1000 HUF")
+        if not whole_filler(initial_deposit):
+            raise InvalidDepositAmountException("Initial deposit must be a whole number of fillér")
+        self.id_number = id_number
+        self.name = name
+        self.balance = initial_deposit
+        # Assigned by BankSystem.create_account from its allocator
+        self.account_number = None
+        self.account_type = account_type
+        self.password_hash = password_hasher.hash(password)
+        self.transaction_log = TransactionLog([Transaction("Deposit", initial_deposit, "Initial Deposit")])
+        self.failed_withdrawals = 0
+        self.is_locked = False
+        self.interest_period = None
+
+    def verify_password(self, password, password_hasher=default_hasher):
+        return password_hasher.verify(password, self.password_hash)
+
+    def deposit(self, amount, trans_type="Deposit", description="Deposit"):
+        if amount <= 0:
+            raise InvalidDepositAmountException("Deposit amount must be positive")
+        if not whole_filler(amount):
+            raise InvalidDepositAmountException("Deposit amount must be a whole number of fillér")
+        # Built first: it rejects amounts that cannot be stored, before the balance changes
+        trans = Transaction(trans_type, amount, description)
+        self.balance += amount
+        self.transaction_log.append(trans)
+        return f"Deposited {amount} HUF"
+
+    def withdraw(self, amount, trans_type="Withdrawal", description="Withdrawal"):
+        if self.is_locked:
+            raise AccountLockedException("Account is locked due to multiple failed withdrawals")
+        if amount <= 0:
+            raise InvalidWithdrawalAmountException("Withdrawal amount must be positive")
+        if not whole_filler(amount):
+            raise InvalidWithdrawalAmountException("Withdrawal amount must be a whole number of fillér")
+        if self.balance - amount < 100:
+            self.failed_withdrawals += 1
+            if self.failed_withdrawals >= 3:
+                self.is_locked = True
+                raise AccountLockedException("Account locked after 3 failed withdrawals")
+            raise InsufficientFundsException("Insufficient funds: Balance cannot go below 100 HUF")
+        trans = Transaction(trans_type, -amount, description)
+        self.balance -= amount
+        self.transaction_log.append(trans)
+        return f"Withdrew {amount} HUF"
+
+    def apply_interest(self, period=None):
+        # Interest is credited at most once per period (a calendar month by default)
+        period = period or current_period()
+        if self.interest_period == period:
+            raise InterestAlreadyAppliedException(f"Interest has already been applied for {period}")
+        interest = round(self.balance * self.interest_rate, 2)
+        trans = Transaction("Interest", interest, self.interest_description)
+        self.balance += interest
+        self.interest_period = period
+        self.transaction_log.append(trans)
+        return f"Applied {self.interest_rate:.0%} interest: {interest} HUF"
+
+    def to_dict(self):
+        return {
+            "id_number": self.id_number,
+            "name": self.name,
+            "balance": self.balance,
+            "account_number": self.account_number,
+            "account_type": self.account_type,
+            "password_hash": self.password_hash,
+            "transaction_log": [trans.to_dict() for trans in self.transaction_log],
+            "failed_withdrawals": self.failed_withdrawals,
+            "is_locked": self.is_locked,
+            "interest_period": self.interest_period
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Password not needed for loading; hash is stored
+        return cls.restore(
+            data["id_number"],
+            data["name"],
+            data["password_hash"],
+            data["balance"],
+            data["account_number"],
+            data["account_type"],
+            data["failed_withdrawals"],
+            data["is_locked"],
+            data.get("interest_period"),
+            TransactionLog(Transaction.from_dict(trans) for trans in data["transaction_log"])
+        )
+
+    @classmethod
+    def restore(cls, id_number, name, password_hash, balance, account_number, account_type,
+                failed_withdrawals, is_locked, interest_period, transaction_log):
+        # Rebuilds a stored account without re-hashing a password or drawing a number
+        account_class = BasicAccount if account_type == "Basic" else PremiumAccount
+        account = account_class.__new__(account_class)
+        account.id_number = id_number
+        account.name = name
+        account.balance = balance
+        account.account_number = account_number
+        account.account_type = account_type
+        account.password_hash = password_hash
+        account.transaction_log = transaction_log
+        account.failed_withdrawals = failed_withdrawals
+        account.is_locked = is_locked
+        account.interest_period = interest_period
+        return account
+
+# Basic and Premium Account Subclasses
+class BasicAccount(SavingsAccount):
+    __slots__ = ()
+    interest_rate = 0.02
+    interest_description = "2% Interest Applied"
+
+class PremiumAccount(SavingsAccount):
+    __slots__ = ()
+    interest_rate = 0.04
+    interest_description = "4% Interest Applied"
+
+# Accounts of a store opened with BankSystem(lazy=True): an account stays a
+# row of the snapshot columns until it is first looked up, then it is built
+# once (under the bank's accounts_lock) and kept. Iterating IDs builds
+# nothing; values() builds every account, as whole-book operations need them.
+class LazyAccounts(MutableMapping):
+    def __init__(self, lock):
+        self.lock = lock
+        self.loaded = {}
+        self.unloaded = {}
+        self.snapshot = None
+        self.transactions = None
+
+    def rebase(self, snapshot, transactions, start=0):
+        # The accounts from row start on are the ones not loaded yet
+        with self.lock:
+            self.snapshot = snapshot
+            self.transactions = transactions
+            self.unloaded = dict(zip(snapshot.ids[start:], range(start, len(snapshot.ids))))
+
+    def __getitem__(self, id_number):
+        account = self.loaded.get(id_number)
+        if account is None:
+            with self.lock:
+                account = self.loaded.get(id_number)
+                if account is None:
+                    row = self.snapshot.row(self.unloaded[id_number]) if id_number in self.unloaded else None
+                    if row is None:
+                        raise KeyError(id_number)
+                    transaction_log = TransactionLog(source=self.transactions, offset=row[-2], stored=row[-1])
+                    account = SavingsAccount.restore(*row[:-2], transaction_log)
+                    # Added before it is dropped from unloaded, so a concurrent
+                    # membership test always finds it in one of the two
+                    self.loaded[id_number] = account
+                    del self.unloaded[id_number]
+        return account
+
+    def __setitem__(self, id_number, account):
+        with self.lock:
+            self.loaded[id_number] = account
+            self.unloaded.pop(id_number, None)
+
+    def __delitem__(self, id_number):
+        with self.lock:
+            if id_number in self.loaded:
+                del self.loaded[id_number]
+            else:
+                del self.unloaded[id_number]
+
+    def __contains__(self, id_number):
+        return id_number in self.unloaded or id_number in self.loaded
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.loaded) + list(self.unloaded))
+
+    def __len__(self):
+        return len(self.loaded) + len(self.unloaded)
+
+    def split(self):
+        # Loaded accounts and the snapshot rows of the others, for compaction
+        return list(self.loaded.values()), [self.snapshot.row(i) for i in self.unloaded.values()]
+
+    def histories(self):
+        for id_number, account in self.loaded.items():
+            yield id_number, account.transaction_log
+        snapshot = self.snapshot
+        for id_number, i in self.unloaded.items():
+            yield id_number, TransactionLog(source=self.transactions, offset=snapshot.trans_offsets[i],
+                                            stored=snapshot.trans_counts[i])
+
+    def index_entries(self):
+        # AccountIndex entries for every account, read from the snapshot
+        # columns for the ones not loaded; the caller holds accounts_lock
+        entries = [(account.id_number, account.name, account.balance, account.account_number, account.is_locked)
+                   for account in self.loaded.values()]
+        snapshot = self.snapshot
+        for id_number, i in self.unloaded.items():
+            entries.append((id_number, snapshot.names[i], snapshot.balances[i], snapshot.account_numbers[i],
+                            bool(snapshot.locked[i])))
+        return entries
+
+# Bank System Class
+class BankSystem:
+    # Operations on different accounts run in parallel; operations on one
+    # account are serialized by its lock stripe. Lock order is accounts_lock,
+    # then stripes in index order, then the journal's and the index's own locks.
+    # self.index holds secondary indexes that every mutation keeps current.
+    # With lazy=True accounts are built on first use (see LazyAccounts) and the
+    # indexes on the first query, so opening a large book costs little.
+    def __init__(self, data_dir=".", sync_policy="always", compact_every=10000, background=False,
+                 lock_stripes=64, password_hasher=default_hasher, session_ttl=900, account_digits=6,
+                 check_digit=False, lazy=False, read_only=False):
+        # read_only opens a store that another process may own (e.g. for an
+        # export next to bank_server.py): nothing is written, and writes raise
+        self.lazy = lazy
+        self.read_only = read_only
+        self.accounts = {}
+        self.account_numbers = set()
+        self.allocator = AccountNumberAllocator(account_digits, check_digit)
+        self.allocator_saved = False
+        # IDs of the legs of cross-store transfers (see transfer_leg) applied here
+        self.transfer_legs = set()
+        self.index = AccountIndex()
+        self.transactions = None
+        self.generation = 0
+        self.data_dir = data_dir
+        self.data_file = os.path.join(data_dir, "bank_data.bin")
+        self.legacy_data_file = os.path.join(data_dir, "bank_data.txt")
+        self.journal = Journal(os.path.join(data_dir, "bank_journal.txt"), sync_policy, background=background)
+        self.compact_every = compact_every
+        self.compact_at = compact_every
+        self.accounts_lock = threading.RLock()
+        self.lock_stripes = [threading.RLock() for _ in range(lock_stripes)]
+        self.compaction_lock = threading.Lock()
+        self.compactor = None
+        self.password_hasher = password_hasher
+        self.sessions = SessionCache(session_ttl)
+        self.store_lock = None if read_only else lock_store(data_dir)
+        try:
+            self.load_data()
+        except BaseException:
+            if self.store_lock:
+                self.store_lock.close()
+            raise
+
+    def account_lock(self, id_number):
+        return self.lock_stripes[hash(id_number) % len(self.lock_stripes)]
+
+    @contextmanager
+    def account_locks(self, id_numbers):
+        # Stripes are always taken in index order, so operations that lock
+        # several accounts cannot deadlock each other
+        stripes = sorted({hash(id_number) % len(self.lock_stripes) for id_number in id_numbers})
+        for stripe in stripes:
+            self.lock_stripes[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self.lock_stripes[stripe].release()
+
+    @contextmanager
+    def exclusive(self):
+        with self.accounts_lock:
+            for lock in self.lock_stripes:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock in reversed(self.lock_stripes):
+                    lock.release()
+
+    def check_writable(self):
+        if self.read_only:
+            raise InvalidOperationException("The store is open read-only")
+
+    def check_open(self, account):
+        # An account removed by another thread must not be journaled again.
+        # Called under a stripe, so a lazy store only looks at the accounts
+        # already built (any account in hand is): building one would take
+        # accounts_lock after the stripe, against the lock order
+        accounts = self.accounts.loaded if self.lazy else self.accounts
+        if accounts.get(account.id_number) is not account:
+            raise AccountNotFoundException("Account not found")
+
+    def create_account(self, id_number, name, initial_deposit, account_type, password, account_number=None,
+                       next_number=None):
+        # account_number/next_number are given when a router allocates numbers
+        # for several stores (bank_shard), so they stay unique across all of them
+        self.check_writable()
+        if not valid_text(id_number):
+            raise InvalidIDException("ID number must be text without NUL characters")
+        if not valid_text(name):
+            raise InvalidOperationException("Name must be text without NUL characters")
+        if not valid_text(password):
+            raise InvalidPasswordException("Password must be text without NUL characters")
+        if id_number in self.accounts:
+            raise InvalidIDException("ID number already exists")
+        if not password:
+            raise InvalidPasswordException("Password cannot be empty")
+        if account_type not in ["Basic", "Premium"]:
+            raise InvalidAccountTypeException("Account type must be Basic or Premium")
+        account_class = BasicAccount if account_type == "Basic" else PremiumAccount
+        account = account_class(id_number, name, initial_deposit, account_type, password, self.password_hasher)
+        with self.accounts_lock:
+            if id_number in self.accounts:
+                raise InvalidIDException("ID number already exists")
+            if account_number is None:
+                account_number = self.allocator.allocate(self.account_numbers)
+                if account_number is None:
+                    raise AccountNumbersExhaustedException("No account numbers left")
+            elif account_number in self.account_numbers:
+                raise InvalidOperationException("Account number already in use")
+            else:
+                self.allocator.claim(account_number, next_number or 0)
+            account.account_number = account_number
+            # Journaled first: if the write fails, no in-memory state refers to the account
+            seq = self.write_journal({"op": "create", "account": account.to_dict(), "next_number": self.allocator.next_index})
+            self.accounts[id_number] = account
+            self.account_numbers.add(account.account_number)
+            self.index.add(account)
+        self.commit(seq)
+        return account
+
+    def login(self, id_number, password):
+        if id_number not in self.accounts:
+            raise InvalidIDException("ID number not found")
+        account = self.accounts[id_number]
+        if not account.verify_password(password, self.password_hasher):
+            raise InvalidPasswordException("Incorrect password")
+        if not self.read_only and self.password_hasher.needs_upgrade(account.password_hash):
+            # Re-hash legacy or weaker hashes with the current scheme
+            password_hash = self.password_hasher.hash(password)
+            with self.account_lock(id_number):
+                self.check_open(account)
+                account.password_hash = password_hash
+                seq = self.write_journal({"op": "password", "id": id_number, "password_hash": password_hash})
+            self.commit(seq)
+        return account
+
+    def open_session(self, id_number, password):
+        self.login(id_number, password)
+        return self.sessions.issue(id_number)
+
+    def authorize(self, token):
+        # O(1) check for follow-up operations instead of re-running the KDF
+        id_number = self.sessions.lookup(token)
+        if id_number is None:
+            raise InvalidSessionException("Session expired or invalid, please log in again")
+        return self.get_account(id_number)
+
+    def close_session(self, token):
+        self.sessions.revoke(token)
+
+    def get_account(self, id_number):
+        if id_number not in self.accounts:
+            raise AccountNotFoundException("Account not found")
+        return self.accounts[id_number]
+
+    def get_account_by_number(self, account_number):
+        # A mistyped number fails the range (and check digit) test without a lookup
+        if not self.allocator.valid(account_number):
+            raise AccountNotFoundException("Invalid account number")
+        accounts = self.find_accounts(account_number=account_number)
+        if not accounts:
+            raise AccountNotFoundException("Account not found")
+        return accounts[0]
+
+    def build_index(self):
+        # A lazily opened store indexes the book on its first query
+        if self.index.deferred:
+            with self.accounts_lock:
+                self.index.build()
+
+    def histories(self):
+        # (id_number, transaction_log) per account, without loading lazy ones
+        if self.lazy:
+            return self.accounts.histories()
+        return ((account.id_number, account.transaction_log) for account in self.accounts.values())
+
+    def find_accounts(self, account_number=None, name=None, min_balance=None, max_balance=None, locked=None):
+        # Accounts matching every given criterion; balances match when
+        # min_balance <= balance < max_balance
+        self.build_index()
+        ids = self.index.find(account_number, name, min_balance, max_balance, locked)
+        return [self.accounts[id_number] for id_number in ids if id_number in self.accounts]
+
+    def transactions_between(self, start=None, end=None, id_numbers=None, trans_type=None):
+        # Yields (account, transaction) for start <= timestamp < end. Only
+        # accounts active in the window are visited, and each history is
+        # searched by binary search over its timestamps while it is in time order
+        start = to_epoch(start) if start else None
+        end = to_epoch(end) if end else None
+        if id_numbers is None:
+            with self.accounts_lock:
+                if start is None and end is None:
+                    accounts = list(self.accounts.values())
+                else:
+                    self.index.build()
+                    active = self.index.active_between(start, end, self.histories())
+                    accounts = [self.accounts[id_number] for id_number in active if id_number in self.accounts]
+        else:
+            accounts = [self.get_account(id_number) for id_number in id_numbers]
+        for account in accounts:
+            log = account.transaction_log
+            with self.account_lock(account.id_number):
+                window = [log[i] for i in log.window(start, end)]
+            for trans in window:
+                if trans_type is None or trans.trans_type == trans_type:
+                    yield account, trans
+
+    def deposit(self, account, amount):
+        self.check_writable()
+        with self.account_lock(account.id_number):
+            self.check_open(account)
+            message = account.deposit(amount)
+            self.index.update(account, account.transaction_log[-1])
+            seq = self.journal_update(account, account.transaction_log[-1])
+        self.commit(seq)
+        return message
+
+    def withdraw(self, account, amount):
+        self.check_writable()
+        with self.account_lock(account.id_number):
+            self.check_open(account)
+            failed_withdrawals = account.failed_withdrawals
+            try:
+                message = account.withdraw(amount)
+            except BankingException as e:
+                error = e
+                self.index.update(account)
+                seq = self.journal_update(account) if account.failed_withdrawals != failed_withdrawals else None
+            else:
+                error = None
+                self.index.update(account, account.transaction_log[-1])
+                seq = self.journal_update(account, account.transaction_log[-1])
+        self.commit(seq)
+        if error:
+            raise error
+        return message
+
+    def transfer(self, source, target, amount):
+        # Both legs are applied under both accounts' locks and journaled as one
+        # record, so a crash can never keep one leg without the other. A
+        # rejected transfer counts as a failed withdrawal from the source.
+        self.check_writable()
+        if source is target:
+            raise InvalidOperationException("Cannot transfer to the same account")
+        with self.account_locks((source.id_number, target.id_number)):
+            self.check_open(source)
+            self.check_open(target)
+            failed_withdrawals = source.failed_withdrawals
+            try:
+                source.withdraw(amount, "Transfer", f"Transfer to {target.account_number}")
+            except BankingException as e:
+                error = e
+                self.index.update(source)
+                seq = self.journal_update(source) if source.failed_withdrawals != failed_withdrawals else None
+            else:
+                error = None
+                target.deposit(amount, "Transfer", f"Transfer from {source.account_number}")
+                self.index.update(source, source.transaction_log[-1])
+                self.index.update(target, target.transaction_log[-1])
+                seq = self.write_journal({
+                    "op": "transfer",
+                    "legs": [self.update_fields(source, source.transaction_log[-1]),
+                             self.update_fields(target, target.transaction_log[-1])]
+                })
+        self.commit(seq)
+        if error:
+            raise error
+        return f"Transferred {amount} HUF to account {target.account_number}"
+
+    def transfer_leg(self, account, leg_id, amount, description, debit):
+        # One side of a transfer between two stores, which bank_shard
+        # coordinates: a withdrawal from the source when debit is set, else a
+        # deposit to the target. A leg is applied at most once per leg_id, so
+        # the coordinator can repeat it after a crash; the ID is kept until
+        # forget_transfers.
+        self.check_writable()
+        with self.account_lock(account.id_number):
+            self.check_open(account)
+            if leg_id in self.transfer_legs:
+                return "Already applied"
+            failed_withdrawals = account.failed_withdrawals
+            try:
+                if debit:
+                    message = account.withdraw(amount, "Transfer", description)
+                else:
+                    message = account.deposit(amount, "Transfer", description)
+            except BankingException as e:
+                error = e
+                self.index.update(account)
+                seq = self.journal_update(account) if account.failed_withdrawals != failed_withdrawals else None
+            else:
+                error = None
+                self.transfer_legs.add(leg_id)
+                self.index.update(account, account.transaction_log[-1])
+                seq = self.write_journal({"op": "update", **self.update_fields(account, account.transaction_log[-1]),
+                                          "leg": leg_id})
+        self.commit(seq)
+        if error:
+            raise error
+        return message
+
+    def transfer_applied(self, leg_id):
+        return leg_id in self.transfer_legs
+
+    def forget_transfers(self, leg_ids=None):
+        # Called once the coordinator has recorded the transfers as finished;
+        # None forgets every leg
+        self.check_writable()
+        with self.accounts_lock:
+            leg_ids = list(self.transfer_legs) if leg_ids is None else [leg for leg in leg_ids
+                                                                         if leg in self.transfer_legs]
+            if not leg_ids:
+                return
+            self.transfer_legs.difference_update(leg_ids)
+            seq = self.write_journal({"op": "forget_transfers", "legs": leg_ids})
+        self.commit(seq)
+
+    def apply_interest(self, account, period=None):
+        self.check_writable()
+        with self.account_lock(account.id_number):
+            self.check_open(account)
+            message = account.apply_interest(period)
+            self.index.update(account, account.transaction_log[-1])
+            seq = self.journal_update(account, account.transaction_log[-1])
+        self.commit(seq)
+        return message
+
+    def apply_interest_batch(self, period=None):
+        # Month-end run over the whole book: one pass over a balance column,
+        # bulk-appended transactions and a single journal record
+        self.check_writable()
+        period = period or current_period()
+        with self.exclusive():
+            accounts = [account for account in self.accounts.values() if account.interest_period != period]
+            balances = array("d", [account.balance for account in accounts])
+            rates = array("d", [account.interest_rate for account in accounts])
+            interest = array("d", [round(balance * rate, 2) for balance, rate in zip(balances, rates)])
+            epoch = int(time.time())
+            self.credit_interest(accounts, interest, period, epoch)
+            seq = self.write_journal({
+                "op": "interest_batch",
+                "period": period,
+                "epoch": epoch,
+                "ids": [account.id_number for account in accounts],
+                "interest": interest.tolist()
+            })
+        self.commit(seq)
+        return len(accounts), sum(interest)
+
+    def credit_interest(self, accounts, interest, period, epoch):
+        restore = Transaction.restore
+        for account, amount in zip(accounts, interest):
+            account.balance += amount
+            account.interest_period = period
+            account.transaction_log.append(restore("Interest", amount, epoch, account.interest_description))
+        self.index.update_many(accounts, epoch)
+
+    def post_batch(self, operations, batch_size=1000, start=1):
+        # Headless posting of {"id_number", "operation", "amount"} rows (plus
+        # "to_id_number" for transfers) with the same rules as the GUI; the
+        # journal is synced once per batch_size rows
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        applied = 0
+        rejections = []
+        self.journal.begin_batch()
+        try:
+            for row_number, row in enumerate(operations, start):
+                try:
+                    account = self.get_account(row["id_number"])
+                    amount = float(row["amount"])
+                    if not math.isfinite(amount):
+                        raise ValueError(amount)
+                    if row["operation"] == "deposit":
+                        self.deposit(account, amount)
+                    elif row["operation"] == "withdraw":
+                        self.withdraw(account, amount)
+                    elif row["operation"] == "transfer":
+                        self.transfer(account, self.get_account(row["to_id_number"]), amount)
+                    else:
+                        raise InvalidOperationException("Operation must be deposit, withdraw or transfer")
+                    applied += 1
+                except KeyError as e:
+                    rejections.append((row_number, f"Missing field {e}"))
+                except (TypeError, ValueError):
+                    rejections.append((row_number, "Amount must be a valid number"))
+                except BankingException as e:
+                    rejections.append((row_number, str(e)))
+                if (row_number - start + 1) % batch_size == 0:
+                    self.journal.commit_batch()
+                    self.journal.begin_batch()
+        finally:
+            self.journal.commit_batch()
+        return applied, rejections
+
+    def remove_account(self, id_number):
+        self.check_writable()
+        with self.accounts_lock, self.account_lock(id_number):
+            if id_number not in self.accounts:
+                raise AccountNotFoundException("Account not found")
+            account = self.accounts[id_number]
+            withdraw_amount = 0
+            if account.balance > 100:
+                withdraw_amount = account.balance - 100
+                account.withdraw(withdraw_amount)
+            self.account_numbers.remove(account.account_number)
+            self.allocator.release(account.account_number)
+            del self.accounts[id_number]
+            self.index.remove(account)
+            seq = self.write_journal({"op": "remove", "id": id_number})
+        self.sessions.revoke_account(id_number)
+        self.commit(seq)
+        return f"Account {account.account_number} removed, {withdraw_amount} HUF withdrawn"
+
+    def journal_update(self, account, trans=None):
+        return self.write_journal({"op": "update", **self.update_fields(account, trans)})
+
+    def update_fields(self, account, trans=None):
+        return {
+            "id": account.id_number,
+            "balance": account.balance,
+            "failed_withdrawals": account.failed_withdrawals,
+            "is_locked": account.is_locked,
+            "interest_period": account.interest_period,
+            "transaction": trans.to_dict() if trans else None
+        }
+
+    def write_journal(self, record):
+        return self.journal.append(record)
+
+    def commit(self, seq):
+        # Runs after the account locks are released: waits for durability when
+        # the journal is written in the background, then compacts if due
+        if seq and self.journal.background and self.journal.sync_policy == "always" and not self.journal.batching:
+            self.journal.wait_durable(seq)
+        if self.journal.records >= self.compact_at and self.compaction_lock.acquire(blocking=False):
+            if self.journal.background:
+                self.compactor = threading.Thread(target=self.compact, name="bank-compactor")
+                self.compactor.start()
+            else:
+                self.compact()
+
+    def compact(self):
+        # The operation that triggered it is already applied and journaled, so
+        # a failed snapshot is only logged; it is tried again once another
+        # compact_every records have been written, not on every operation
+        try:
+            self.save_data()
+            self.compact_at = self.compact_every
+        except Exception as e:
+            self.compact_at = self.journal.records + self.compact_every
+            print(f"Compaction failed, retrying after {self.compact_every} more journal records: {e!r}")
+        finally:
+            self.compaction_lock.release()
+
+    def apply_record(self, record):
+        if record["op"] == "create":
+            account = SavingsAccount.from_dict(record["account"])
+            self.accounts[account.id_number] = account
+            self.account_numbers.add(account.account_number)
+            self.index.add(account)
+            if "next_number" in record:
+                self.allocator.claim(account.account_number, record["next_number"])
+        elif record["op"] == "update":
+            self.apply_update(record)
+            if "leg" in record:
+                self.transfer_legs.add(record["leg"])
+        elif record["op"] == "transfer":
+            for leg in record["legs"]:
+                self.apply_update(leg)
+        elif record["op"] == "interest_batch":
+            accounts = [self.accounts[id_number] for id_number in record["ids"]]
+            self.credit_interest(accounts, record["interest"], record["period"], record["epoch"])
+        elif record["op"] == "password":
+            self.accounts[record["id"]].password_hash = record["password_hash"]
+        elif record["op"] == "remove":
+            account = self.accounts.pop(record["id"])
+            self.account_numbers.discard(account.account_number)
+            self.allocator.release(account.account_number)
+            self.index.remove(account)
+        elif record["op"] == "forget_transfers":
+            self.transfer_legs.difference_update(record["legs"])
+        elif record["op"] == "allocator":
+            self.allocator.key = bytes.fromhex(record["key"])
+            self.allocator_saved = True
+
+    def apply_update(self, record):
+        account = self.accounts[record["id"]]
+        account.balance = record["balance"]
+        account.failed_withdrawals = record["failed_withdrawals"]
+        account.is_locked = record["is_locked"]
+        account.interest_period = record.get("interest_period")
+        trans = Transaction.from_dict(record["transaction"]) if record["transaction"] else None
+        if trans:
+            account.transaction_log.append(trans)
+        self.index.update(account, trans)
+
+    def save_data(self):
+        self.check_writable()
+        with self.exclusive():
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        # Compaction: write a full snapshot, then drop the journal it covers
+        snapshot = Snapshot(self.journal.seq, self.generation + 1)
+        snapshot.allocator_key = self.allocator.key.hex()
+        snapshot.allocator_next = self.allocator.next_index
+        snapshot.released_numbers = array("q", self.allocator.released)
+        snapshot.transfer_legs = sorted(self.transfer_legs)
+        snapshot.open_records(self.data_dir)
+        if self.lazy:
+            accounts, rows = self.accounts.split()
+        else:
+            accounts, rows = list(self.accounts.values()), []
+        for entry in self.snapshot_entries(accounts, rows):
+            snapshot.add_account(*entry)
+        snapshot.write(self.data_file)
+        old_transactions = self.transactions
+        self.transactions = snapshot.open_transactions(self.data_dir)
+        self.generation = snapshot.generation
+        for account, offset in zip(accounts, snapshot.trans_offsets):
+            account.transaction_log.rebind(self.transactions, offset)
+        if self.lazy:
+            self.accounts.rebase(snapshot, self.transactions, len(accounts))
+        if old_transactions:
+            old_transactions.close()
+            if old_transactions.path and os.path.exists(old_transactions.path):
+                os.remove(old_transactions.path)
+        if self.journal.file:
+            self.journal.reset()
+
+    def snapshot_entries(self, accounts, rows):
+        # Snapshot.add_account arguments for loaded accounts, then for the
+        # snapshot rows of accounts a lazy store never loaded, whose records
+        # are copied one by one from the current record file
+        for account in accounts:
+            yield (account.id_number, account.name, account.password_hash, account.balance,
+                   account.account_number, account.account_type, account.failed_withdrawals,
+                   account.is_locked, account.interest_period,
+                   ((trans.trans_type, trans.amount, trans.epoch, trans.description)
+                    for trans in account.transaction_log))
+        for row in rows:
+            offset, count = row[-2:]
+            yield (*row[:-2], (self.transactions.record(i) for i in range(offset, offset + count)))
+
+    def load_data(self):
+        if not os.path.exists(self.data_file) and os.path.exists(self.legacy_data_file):
+            if self.read_only:
+                raise InvalidOperationException(f"{self.legacy_data_file} has to be migrated by a read-write open first")
+            count = migrate_text_data(self.legacy_data_file, self.data_file)
+            os.replace(self.legacy_data_file, self.legacy_data_file + ".migrated")
+            print(f"Migrated {count} accounts from {self.legacy_data_file} to {self.data_file}")
+        if self.read_only:
+            self.load_read_only()
+            return
+        snapshot_seq = self.read_snapshot()
+        current_records = records_path(self.data_dir, self.generation)
+        for path in glob.glob(records_path(glob.escape(self.data_dir), "*")):
+            if os.path.abspath(path) != os.path.abspath(current_records):
+                os.remove(path)
+        self.replay_journal(snapshot_seq)
+        self.journal.open(snapshot_seq)
+        if not self.allocator_saved:
+            # The permutation key has to survive a restart before the next snapshot
+            self.write_journal({"op": "allocator", "key": self.allocator.key.hex()})
+            self.allocator_saved = True
+
+    def load_read_only(self):
+        # The process that owns the store may compact it meanwhile, replacing
+        # the snapshot, deleting its record file and emptying the journal; the
+        # load starts over until it has read one snapshot and its journal
+        while True:
+            version = file_version(self.data_file)
+            try:
+                self.replay_journal(self.read_snapshot(), repair=False)
+                if file_version(self.data_file) == version:
+                    return
+            except FileNotFoundError:
+                pass
+            if self.transactions:
+                self.transactions.close()
+            self.accounts = {}
+            self.account_numbers = set()
+            self.transfer_legs = set()
+            self.index = AccountIndex()
+            self.transactions = None
+            self.journal = Journal(self.journal.path)
+
+    def read_snapshot(self):
+        # Returns the sequence number of the last journal record it covers
+        if self.lazy:
+            self.accounts = LazyAccounts(self.accounts_lock)
+        snapshot_seq = 0
+        if os.path.exists(self.data_file):
+            snapshot = Snapshot.read(self.data_file)
+            snapshot_seq = snapshot.journal_seq
+            self.generation = snapshot.generation
+            if snapshot.allocator_key:
+                self.allocator.key = bytes.fromhex(snapshot.allocator_key)
+                self.allocator.next_index = snapshot.allocator_next
+                self.allocator.released = dict.fromkeys(snapshot.released_numbers)
+                self.allocator_saved = True
+            self.transfer_legs = set(snapshot.transfer_legs)
+            self.transactions = snapshot.open_transactions(self.data_dir)
+            if self.lazy:
+                self.accounts.rebase(snapshot, self.transactions)
+                self.account_numbers = set(snapshot.account_numbers)
+            else:
+                for row in snapshot.rows():
+                    transaction_log = TransactionLog(source=self.transactions, offset=row[-2], stored=row[-1])
+                    account = SavingsAccount.restore(*row[:-2], transaction_log)
+                    self.accounts[account.id_number] = account
+                    self.account_numbers.add(account.account_number)
+        if self.lazy:
+            self.index.defer(self.accounts.index_entries)
+        else:
+            self.index.rebuild(self.accounts.values())
+        return snapshot_seq
+
+    def replay_journal(self, snapshot_seq, repair=True):
+        for record in self.journal.replay(snapshot_seq, repair):
+            try:
+                self.apply_record(record)
+            except Exception as e:
+                print(f"Error replaying journal record {record['seq']}: {e}")
+
+    def close(self):
+        if self.compactor:
+            self.compactor.join()
+        self.journal.close()
+        if self.transactions:
+            self.transactions.close()
+        if self.store_lock:
+            self.store_lock.close()
+            self.store_lock = None
+
+    def export_transactions(self, account):
+        filename = f"transactions_{account.account_number}.csv"
+        with self.account_lock(account.id_number), open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Account Number", "Date/Time", "Action", "Amount", "Description"])
+            for trans in account.transaction_log:
+                writer.writerow([
+                    account.account_number,
+                    trans.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                    trans.trans_type,
+                    trans.amount,
+                    trans.description
+                ])
+        return filename
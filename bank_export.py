@@ -0,0 +1,229 @@
+# Streaming transaction export over a time window and a set of accounts.
+#   python bank_export.py out.csv --from 2024-01-01 --to 2024-02-01
+#   python bank_export.py out.jsonl --accounts 12,42 --format jsonl
+#   python bank_export.py nightly.col --format columnar --watermark nightly
+# Rows are read from each account's history in small chunks, so memory use
+# does not grow with history size. With --watermark NAME only transactions
+# added since the previous export under that name are written.
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bank_snapshot import read_section, to_epoch, write_array, write_strings
+from bank_core import BankSystem
+
+CHUNK_SIZE = 4096
+FORMATS = ("csv", "jsonl", "columnar")
+COLUMNAR_MAGIC = b"BANKCOL1"
+ROW_GROUP = struct.Struct("<II")
+
+class CsvWriter:
+    header = "Account Number,Date/Time,Action,Amount,Description\r\n".encode()
+
+    def __init__(self, f):
+        self.stream = io.TextIOWrapper(f, newline="", write_through=True)
+        self.writer = csv.writer(self.stream)
+
+    def write(self, account_number, trans):
+        self.writer.writerow([account_number, trans.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                              trans.trans_type, trans.amount, trans.description])
+
+    def close(self):
+        self.stream.flush()
+        self.stream.detach()
+
+class JsonlWriter:
+    header = b""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, account_number, trans):
+        self.f.write(json.dumps({
+            "account_number": account_number,
+            "timestamp": trans.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "type": trans.trans_type,
+            "amount": trans.amount,
+            "description": trans.description
+        }).encode() + b"\n")
+
+    def close(self):
+        pass
+
+# Compressed columnar format: a magic header followed by zlib-compressed row
+# groups, each holding account number, epoch, amount, type and description columns
+class ColumnarWriter:
+    header = COLUMNAR_MAGIC
+
+    def __init__(self, f, group_size=65536):
+        self.f = f
+        self.group_size = group_size
+        self.reset()
+
+    def reset(self):
+        self.account_numbers = array("q")
+        self.epochs = array("q")
+        self.amounts = array("d")
+        self.types = []
+        self.descriptions = []
+
+    def write(self, account_number, trans):
+        self.account_numbers.append(account_number)
+        self.epochs.append(trans.epoch)
+        self.amounts.append(trans.amount)
+        self.types.append(trans.trans_type)
+        self.descriptions.append(trans.description)
+        if len(self.epochs) >= self.group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.epochs:
+            return
+        payload = io.BytesIO()
+        for values in (self.account_numbers, self.epochs, self.amounts):
+            write_array(payload, values)
+        write_strings(payload, self.types)
+        write_strings(payload, self.descriptions)
+        data = zlib.compress(payload.getvalue())
+        self.f.write(ROW_GROUP.pack(len(self.epochs), len(data)))
+        self.f.write(data)
+        self.reset()
+
+    def close(self):
+        self.flush()
+
+def read_columnar(path):
+    # Yields (account_number, epoch, amount, type, description) rows
+    with open(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar export")
+        while True:
+            header = f.read(ROW_GROUP.size)
+            if not header:
+                return
+            rows, length = ROW_GROUP.unpack(header)
+            payload = io.BytesIO(zlib.decompress(f.read(length)))
+            columns = [read_section(payload) for _ in range(3)]
+            columns += [read_section(payload, rows) for _ in range(2)]
+            yield from zip(*columns)
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "columnar": ColumnarWriter}
+
+def export_accounts(bank, accounts, f, file_format, start, end, watermarks):
+    # Writes one worker's share of accounts; returns the new watermark per
+    # account. watermarks is None unless the export is incremental.
+    writer = WRITERS[file_format](f)
+    positions = {}
+    for account in accounts:
+        log = account.transaction_log
+        with bank.account_lock(account.id_number):
+            indexes = log.window(start, end)
+            stop = log.bisect(end) if end is not None else len(log)
+        if watermarks is not None:
+            # Only history before the first transaction at or after end is
+            # passed, so what follows it is still new to the next export
+            watermark = watermarks.get(account.id_number, 0)
+            indexes = indexes[bisect_left(indexes, watermark):bisect_left(indexes, stop)]
+            positions[account.id_number] = max(stop, watermark)
+        for chunk_start in range(0, len(indexes), CHUNK_SIZE):
+            # The lock is held per chunk only, so compaction can rebind the log in between
+            with bank.account_lock(account.id_number):
+                chunk = [log[i] for i in indexes[chunk_start:chunk_start + CHUNK_SIZE]]
+            for trans in chunk:
+                writer.write(account.account_number, trans)
+    writer.close()
+    return positions
+
+def load_watermarks(bank, name):
+    path = os.path.join(bank.data_dir, "export_watermarks.json")
+    if not os.path.exists(path):
+        return path, {}
+    with open(path, "r") as f:
+        return path, json.load(f).get(name, {}) if name else {}
+
+def save_watermarks(path, name, positions):
+    data = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            data = json.load(f)
+    data[name] = positions
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+def export_range(bank, path, start=None, end=None, id_numbers=None, file_format="csv", watermark=None, workers=4):
+    # start/end are datetimes (end exclusive); id_numbers=None exports every account
+    if file_format not in FORMATS:
+        raise ValueError(f"Export format must be one of {', '.join(FORMATS)}")
+    start = to_epoch(start) if start else None
+    end = to_epoch(end) if end else None
+    if id_numbers is None:
+        accounts = list(bank.accounts.values())
+    else:
+        accounts = [bank.get_account(id_number) for id_number in id_numbers]
+    watermark_path, watermarks = load_watermarks(bank, watermark)
+    workers = max(1, min(workers, len(accounts)))
+    shares = [accounts[i::workers] for i in range(workers)]
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as parts_dir:
+        part_paths = [os.path.join(parts_dir, f"part{i}") for i in range(workers)]
+
+        def export_share(i):
+            with open(part_paths[i], "wb") as f:
+                return export_accounts(bank, shares[i], f, file_format, start, end,
+                                       watermarks if watermark else None)
+
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(export_share, range(workers)))
+        with open(path, "wb") as out:
+            out.write(WRITERS[file_format].header)
+            for part_path in part_paths:
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+    if watermark:
+        positions = dict(watermarks)
+        for result in results:
+            positions.update(result)
+        save_watermarks(watermark_path, watermark, positions)
+    return path
+
+def parse_time(value):
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"Invalid date {value!r}, expected YYYY-MM-DD[ HH:MM:SS]")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export transactions for a time window")
+    parser.add_argument("path")
+    parser.add_argument("--from", dest="start", type=parse_time, help="inclusive start, YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--to", dest="end", type=parse_time, help="exclusive end, YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--accounts", help="comma-separated ID numbers (default: all accounts)")
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    parser.add_argument("--watermark", help="only export what is new since the last export with this name")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--data-dir", default=".")
+    args = parser.parse_args()
+    # Read-only, so an export can run next to bank_server.py on the same store;
+    # exporting a few accounts only needs those loaded
+    bank = BankSystem(args.data_dir, lazy=bool(args.accounts), read_only=True)
+    try:
+        id_numbers = args.accounts.split(",") if args.accounts else None
+        export_range(bank, args.path, args.start, args.end, id_numbers, args.format, args.watermark, args.workers)
+    finally:
+        bank.close()
+    print(f"Transactions exported to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import threading
+from bisect import bisect_left, insort
+
+CHUNK_SIZE = 1000
+ACTIVITY_BUCKET = 86400
+
+# Sorted list kept as a list of short sorted chunks, so an insert or delete
+# moves one chunk instead of the whole list
+class SortedKeys:
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self.chunks = [keys[i:i + CHUNK_SIZE] for i in range(0, len(keys), CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+        self.size = len(keys)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def add(self, key):
+        self.size += 1
+        if not self.chunks:
+            self.chunks.append([key])
+            self.maxes.append(key)
+            return
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            i -= 1
+            self.chunks[i].append(key)
+            self.maxes[i] = key
+        else:
+            insort(self.chunks[i], key)
+        chunk = self.chunks[i]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self.chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self.maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, key):
+        i = bisect_left(self.maxes, key)
+        chunk = self.chunks[i]
+        del chunk[bisect_left(chunk, key)]
+        self.size -= 1
+        if chunk:
+            self.maxes[i] = chunk[-1]
+        else:
+            del self.chunks[i]
+            del self.maxes[i]
+
+    def range(self, low=None, high=None):
+        # Keys with low <= key < high; either bound may be a prefix tuple
+        i = bisect_left(self.maxes, low) if low is not None else 0
+        while i < len(self.chunks):
+            chunk = self.chunks[i]
+            start = bisect_left(chunk, low) if low is not None else 0
+            stop = bisect_left(chunk, high) if high is not None else len(chunk)
+            yield from chunk[start:stop]
+            if stop < len(chunk):
+                return
+            i += 1
+
+# Secondary indexes over BankSystem.accounts: account number to ID, name to
+# IDs, (balance, ID) keys in balance order, the set of locked IDs and, per day,
+# the IDs that have transactions on it. BankSystem updates them on every
+# mutation so lookups never scan the whole book. entries keeps each account's
+# indexed values so it can be re-keyed in place. The per-day activity map is
+# built on first use so startup stays lazy; with defer() so is everything else.
+class AccountIndex:
+    def __init__(self):
+        self.by_number = {}
+        self.by_name = {}
+        self.balances = SortedKeys()
+        self.locked = set()
+        self.entries = {}
+        self.activity = None
+        self.deferred = None
+        self.lock = threading.Lock()
+
+    def rebuild(self, accounts):
+        with self.lock:
+            self.load((account.id_number, account.name, account.balance, account.account_number, account.is_locked)
+                      for account in accounts)
+
+    def defer(self, entries):
+        # Lazy stores: nothing is indexed until build() runs before the first
+        # query, and mutations until then need no upkeep. entries() is called
+        # under the index lock, so updates made meanwhile wait and re-key after
+        with self.lock:
+            self.deferred = entries
+
+    def build(self):
+        with self.lock:
+            if self.deferred:
+                self.load(self.deferred())
+
+    def load(self, entries):
+        # entries: (id_number, name, balance, account_number, is_locked) per account
+        self.by_number = {}
+        self.by_name = {}
+        self.locked = set()
+        self.entries = {}
+        self.activity = None
+        self.deferred = None
+        for id_number, name, balance, account_number, is_locked in entries:
+            self.by_number[account_number] = id_number
+            self.by_name.setdefault(name, set()).add(id_number)
+            if is_locked:
+                self.locked.add(id_number)
+            self.entries[id_number] = (balance, name, account_number)
+        self.balances = SortedKeys((entry[0], id_number) for id_number, entry in self.entries.items())
+
+    def add(self, account):
+        with self.lock:
+            if self.deferred:
+                return
+            self.by_number[account.account_number] = account.id_number
+            self.by_name.setdefault(account.name, set()).add(account.id_number)
+            if account.is_locked:
+                self.locked.add(account.id_number)
+            self.entries[account.id_number] = (account.balance, account.name, account.account_number)
+            self.balances.add((account.balance, account.id_number))
+            for i in range(len(account.transaction_log)):
+                self.touch(account.id_number, account.transaction_log.epoch_at(i))
+
+    def remove(self, account):
+        # Days the account was active on keep its ID; queries skip removed accounts
+        with self.lock:
+            if self.deferred:
+                return
+            balance, name, account_number = self.entries.pop(account.id_number)
+            self.balances.remove((balance, account.id_number))
+            del self.by_number[account_number]
+            names = self.by_name[name]
+            names.discard(account.id_number)
+            if not names:
+                del self.by_name[name]
+            self.locked.discard(account.id_number)
+
+    def update(self, account, trans=None):
+        with self.lock:
+            if self.deferred:
+                return
+            self.reindex(account)
+            if trans:
+                self.touch(account.id_number, trans.epoch)
+
+    def update_many(self, accounts, epoch=None):
+        # Re-sorting once is cheaper than moving entries one by one when a
+        # large share of the book changed, e.g. after a batch interest run
+        with self.lock:
+            if self.deferred:
+                return
+            if epoch is not None:
+                for account in accounts:
+                    self.touch(account.id_number, epoch)
+            if len(accounts) * 8 < len(self.balances):
+                for account in accounts:
+                    self.reindex(account)
+                return
+            for account in accounts:
+                self.entries[account.id_number] = (account.balance, account.name, account.account_number)
+                if account.is_locked:
+                    self.locked.add(account.id_number)
+                else:
+                    self.locked.discard(account.id_number)
+            self.balances = SortedKeys((entry[0], id_number) for id_number, entry in self.entries.items())
+
+    def reindex(self, account):
+        entry = self.entries[account.id_number]
+        if entry[0] != account.balance:
+            self.balances.remove((entry[0], account.id_number))
+            self.balances.add((account.balance, account.id_number))
+            self.entries[account.id_number] = (account.balance, entry[1], entry[2])
+        if account.is_locked:
+            self.locked.add(account.id_number)
+        else:
+            self.locked.discard(account.id_number)
+
+    def touch(self, id_number, epoch):
+        if self.activity is not None:
+            self.activity.setdefault(epoch // ACTIVITY_BUCKET, set()).add(id_number)
+
+    def find(self, account_number=None, name=None, min_balance=None, max_balance=None, locked=None):
+        # Starts from the most selective index given and checks the other
+        # criteria against the indexed values; the balance range is half-open
+        with self.lock:
+            if account_number is not None:
+                candidates = [self.by_number[account_number]] if account_number in self.by_number else []
+            elif name is not None:
+                candidates = list(self.by_name.get(name, ()))
+            elif locked:
+                candidates = list(self.locked)
+            elif min_balance is not None or max_balance is not None:
+                candidates = [id_number for _, id_number in self.balances.range(
+                    (min_balance,) if min_balance is not None else None,
+                    (max_balance,) if max_balance is not None else None)]
+            else:
+                candidates = list(self.entries)
+            matches = []
+            for id_number in candidates:
+                balance, entry_name, entry_number = self.entries[id_number]
+                if account_number is not None and entry_number != account_number:
+                    continue
+                if name is not None and entry_name != name:
+                    continue
+                if min_balance is not None and balance < min_balance:
+                    continue
+                if max_balance is not None and balance >= max_balance:
+                    continue
+                if locked is not None and (id_number in self.locked) != locked:
+                    continue
+                matches.append(id_number)
+            return matches
+
+    def active_between(self, start, end, histories):
+        # IDs with transactions on any day overlapping [start, end) epoch
+        # seconds; histories yields (id_number, transaction_log) per account
+        with self.lock:
+            if self.activity is None:
+                self.activity = {}
+                for id_number, log in histories:
+                    for i in range(len(log)):
+                        self.touch(id_number, log.epoch_at(i))
+            first = start // ACTIVITY_BUCKET if start is not None else None
+            last = (end - 1) // ACTIVITY_BUCKET if end is not None else None
+            if first is not None and last is not None and last - first < len(self.activity):
+                days = range(first, last + 1)
+            else:
+                days = [day for day in self.activity
+                        if (first is None or day >= first) and (last is None or day <= last)]
+            active = set()
+            for day in days:
+                active.update(self.activity.get(day, ()))
+            return active
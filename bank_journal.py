@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+
+SYNC_POLICIES = ("always", "group", "interval")
+
+# Append-only journal of per-operation records. With background=True a writer
+# thread does the file I/O, so callers only serialize a record and move on;
+# wait_durable() blocks until a record is fsynced, and concurrent waiters
+# share one fsync (group commit).
+class Journal:
+    def __init__(self, path, sync_policy="always", group_size=64, sync_interval=1.0, background=False):
+        if sync_policy not in SYNC_POLICIES:
+            raise ValueError(f"Sync policy must be one of {', '.join(SYNC_POLICIES)}")
+        self.path = path
+        self.sync_policy = sync_policy
+        self.group_size = group_size
+        self.sync_interval = sync_interval
+        self.background = background
+        self.seq = 0
+        self.records = 0
+        self.unsynced = 0
+        self.written_seq = 0
+        self.durable_seq = 0
+        self.last_sync = time.monotonic()
+        # Batch depth of each calling thread, see begin_batch
+        self.batches = threading.local()
+        self.unbatched_seq = 0
+        self.pending = []
+        self.sync_requested = False
+        self.closing = False
+        self.lock = threading.RLock()
+        self.io_lock = threading.RLock()
+        self.wakeup = threading.Condition(self.lock)
+        self.durable = threading.Condition()
+        self.writer = None
+        self.file = None
+
+    def replay(self, after_seq=0, repair=True):
+        # Yields every complete record newer than the snapshot; a torn tail left
+        # by a crash is cut off so later appends start on a clean line. Readers
+        # of a store another process owns pass repair=False: to them a torn
+        # tail is a record still being written.
+        if not os.path.exists(self.path):
+            return
+        good_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_size += len(line)
+                self.records += 1
+                self.seq = max(self.seq, record["seq"])
+                if record["seq"] > after_seq:
+                    yield record
+        if repair and good_size != os.path.getsize(self.path):
+            print(f"Discarding incomplete journal tail in {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good_size)
+
+    def open(self, seq=0):
+        self.seq = max(self.seq, seq)
+        self.written_seq = self.durable_seq = self.seq
+        self.file = open(self.path, "a", encoding="utf-8")
+        if self.background:
+            self.closing = False
+            self.writer = threading.Thread(target=self.write_loop, name="journal-writer", daemon=True)
+            self.writer.start()
+
+    def append(self, record):
+        with self.lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            line = json.dumps(record) + "\n"
+            self.records += 1
+            batching = self.batching
+            if not batching:
+                self.unbatched_seq = self.seq
+            if self.background:
+                self.pending.append(line)
+                self.wakeup.notify_all()
+                return self.seq
+            with self.io_lock:
+                self.file.write(line)
+                self.unsynced += 1
+                self.written_seq = self.seq
+                if not batching and self.sync_due():
+                    self.sync()
+            return self.seq
+
+    def sync_due(self):
+        if self.sync_policy == "always":
+            return True
+        if self.sync_policy == "group":
+            return self.unsynced >= self.group_size
+        return time.monotonic() - self.last_sync >= self.sync_interval
+
+    def write_loop(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.sync_requested and not self.closing:
+                    self.wakeup.wait(self.sync_interval if self.unsynced else None)
+                    if self.unsynced and self.sync_wanted():
+                        break
+                lines, self.pending = self.pending, []
+                seq = self.seq
+                sync_requested, self.sync_requested = self.sync_requested, False
+                closing = self.closing and not lines
+            with self.io_lock:
+                if lines:
+                    self.file.write("".join(lines))
+                    self.unsynced += len(lines)
+                    self.written_seq = seq
+                if self.unsynced and (sync_requested or self.sync_wanted()):
+                    self.sync()
+            if closing:
+                return
+
+    def sync_wanted(self):
+        # Records appended inside a batch wait for its commit_batch; the
+        # policy only applies once a record from outside a batch is unsynced
+        return self.durable_seq < self.unbatched_seq and self.sync_due()
+
+    def wait_durable(self, seq):
+        if not self.background:
+            with self.io_lock:
+                if self.durable_seq < seq:
+                    self.sync()
+            return
+        with self.lock:
+            if self.durable_seq >= seq:
+                return
+            self.sync_requested = True
+            self.wakeup.notify_all()
+        with self.durable:
+            while self.durable_seq < seq:
+                self.durable.wait()
+
+    def flush(self):
+        self.wait_durable(self.seq)
+
+    @property
+    def batching(self):
+        return getattr(self.batches, "depth", 0) > 0
+
+    def begin_batch(self):
+        # Group commit: records the calling thread appends until commit_batch
+        # share one fsync; other threads' appends are synced as usual. Batches
+        # nest; only the outermost commit_batch syncs.
+        self.batches.depth = getattr(self.batches, "depth", 0) + 1
+
+    def commit_batch(self):
+        self.batches.depth -= 1
+        if self.batches.depth:
+            return
+        self.flush()
+
+    def sync(self):
+        with self.io_lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.last_sync = time.monotonic()
+            written_seq = self.written_seq
+        with self.durable:
+            self.durable_seq = max(self.durable_seq, written_seq)
+            self.durable.notify_all()
+
+    def reset(self):
+        # Called once a snapshot covering every record has been written
+        self.flush()
+        with self.io_lock:
+            self.file.seek(0)
+            self.file.truncate()
+            self.sync()
+            self.records = 0
+
+    def close(self):
+        if not self.file:
+            return
+        if self.writer:
+            with self.lock:
+                self.closing = True
+                self.wakeup.notify_all()
+            self.writer.join()
+            self.writer = None
+        self.sync()
+        self.file.close()
+        self.file = None
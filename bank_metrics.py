@@ -0,0 +1,307 @@
+# Opt-in instrumentation. enable() wraps the BankSystem, SavingsAccount,
+# journal, snapshot, password-hashing and (when loaded) GUI methods with
+# timers that feed per-operation latency histograms; disable() puts the
+# original methods back, so nothing is measured (and nothing costs time)
+# unless it is switched on.
+#   metrics = bank_metrics.enable()
+#   ...
+#   metrics.write_prometheus("bank_metrics.prom")   # or write_json(...)
+#   with bank_metrics.Profiler("bank.folded"): ...   # flamegraph.pl input
+import functools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+import bank_auth
+import bank_core
+import bank_journal
+import bank_snapshot
+
+# Bucket k counts durations under 1024 << k nanoseconds (about 1 us to 17 s);
+# longer ones only show up in +Inf
+BUCKETS = [(1024 << k) / 1e9 for k in range(25)]
+
+# Operations callers wait on, plus the slow steps inside them (fsync,
+# snapshot I/O, password hashing, journal replay parsing)
+TARGETS = [
+    (bank_core.BankSystem, [
+        "create_account", "login", "open_session", "authorize", "deposit", "withdraw", "transfer", "transfer_leg",
+        "apply_interest", "apply_interest_batch", "post_batch", "remove_account", "find_accounts",
+        "export_transactions", "save_data", "load_data"]),
+    (bank_core.SavingsAccount, ["verify_password"]),
+    (bank_core.Transaction, ["from_dict"]),
+    (bank_journal.Journal, ["sync", "reset"]),
+    (bank_snapshot.Snapshot, ["write", "read"]),
+    (bank_auth.PasswordHasher, ["hash", "verify"]),
+]
+
+# Steps that run inside every operation; timing them too roughly doubles the
+# overhead, so they are only wrapped with enable(detail=True)
+DETAIL_TARGETS = [
+    (bank_core.SavingsAccount, ["deposit", "withdraw", "apply_interest"]),
+    (bank_core.Transaction, ["to_dict"]),
+    (bank_core.BankSystem, ["commit"]),
+    (bank_journal.Journal, ["append"]),
+]
+
+def gui_targets():
+    # GUI redraws are timed only when the GUI is loaded (imported or run as a
+    # script); importing it here would pull tkinter into headless processes
+    for name in ("bankingSimulation", "__main__"):
+        app = getattr(sys.modules.get(name), "BankingApp", None)
+        if app:
+            return [(app, ["update_account_info", "render_history"])]
+    return []
+
+# Updated without a lock to keep timed calls cheap: under the GIL a thread
+# switch inside an increment is rare, and at worst drops one observation
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * 64
+        self.total_ns = 0
+        self.errors = 0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def total(self):
+        return self.total_ns / 1e9
+
+    def buckets(self):
+        # Per-bucket counts for BUCKETS followed by the +Inf overflow
+        return self.counts[:len(BUCKETS)] + [sum(self.counts[len(BUCKETS):])]
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Metrics:
+    def __init__(self):
+        self.operations = {}
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def histogram(self, name):
+        with self.lock:
+            return self.operations.setdefault(name, Histogram())
+
+    def to_json(self):
+        return {
+            "operations": {
+                name: {
+                    "count": histogram.count,
+                    "errors": histogram.errors,
+                    "total_seconds": histogram.total,
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p99_seconds": histogram.quantile(0.99),
+                    "buckets": dict(zip(map(str, BUCKETS + ["+Inf"]), histogram.buckets())),
+                }
+                for name, histogram in sorted(self.operations.items()) if histogram.count
+            },
+            "counters": dict(self.counters),
+        }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP bank_operation_seconds Latency of instrumented bank operations",
+            "# TYPE bank_operation_seconds histogram",
+        ]
+        for name, histogram in sorted(self.operations.items()):
+            if not histogram.count:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ["+Inf"], histogram.buckets()):
+                cumulative += count
+                lines.append(f'bank_operation_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'bank_operation_seconds_sum{{op="{name}"}} {histogram.total}')
+            lines.append(f'bank_operation_seconds_count{{op="{name}"}} {histogram.count}')
+        lines += [
+            "# HELP bank_operation_errors_total Instrumented operations that raised",
+            "# TYPE bank_operation_errors_total counter",
+        ]
+        for name, histogram in sorted(self.operations.items()):
+            if histogram.errors:
+                lines.append(f'bank_operation_errors_total{{op="{name}"}} {histogram.errors}')
+        lines += [
+            "# HELP bank_snapshot_bytes Bytes written per snapshot (save_data)",
+            "# TYPE bank_snapshot_bytes summary",
+            f"bank_snapshot_bytes_sum {self.counters['snapshot_bytes']}",
+            f"bank_snapshot_bytes_count {self.counters['snapshots']}",
+            "# HELP bank_journal_bytes_total Bytes made durable in the journal",
+            "# TYPE bank_journal_bytes_total counter",
+            f"bank_journal_bytes_total {self.counters['journal_bytes']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_atomic(path, self.to_prometheus())
+
+    def write_json(self, path):
+        write_atomic(path, json.dumps(self.to_json(), indent=2))
+
+def write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+def timed(function, histogram):
+    perf_counter_ns = time.perf_counter_ns
+    counts = histogram.counts
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        except BaseException:
+            histogram.errors += 1
+            raise
+        finally:
+            elapsed = perf_counter_ns() - start
+            counts[(elapsed >> 10).bit_length()] += 1
+            histogram.total_ns += elapsed
+    return wrapper
+
+def snapshot_write(function, metrics):
+    @functools.wraps(function)
+    def wrapper(snapshot, path):
+        records = snapshot.records_file.name[:-len(".tmp")]
+        function(snapshot, path)
+        metrics.counters["snapshot_bytes"] += os.path.getsize(path) + os.path.getsize(records)
+        metrics.counters["snapshots"] += 1
+    return wrapper
+
+def journal_sync(function, metrics):
+    # Counts the growth of the journal file since the previous fsync seen by
+    # these metrics; a journal reset starts over from an empty file
+    @functools.wraps(function)
+    def wrapper(journal):
+        function(journal)
+        size = os.fstat(journal.file.fileno()).st_size
+        owner, last = getattr(journal, "metrics_size", (None, 0))
+        if owner is metrics:
+            metrics.counters["journal_bytes"] += size - last if size >= last else size
+        journal.metrics_size = (metrics, size)
+    return wrapper
+
+originals = []
+active = None
+
+def enable(metrics=None, detail=False):
+    global active
+    if active:
+        return active
+    metrics = metrics or Metrics()
+    for cls, names in TARGETS + gui_targets() + (DETAIL_TARGETS if detail else []):
+        for name in names:
+            original = cls.__dict__[name]
+            histogram = metrics.histogram(f"{cls.__name__}.{name}")
+            if isinstance(original, (classmethod, staticmethod)):
+                replacement = type(original)(timed(original.__func__, histogram))
+            else:
+                replacement = timed(original, histogram)
+            originals.append((cls, name, original))
+            setattr(cls, name, replacement)
+    for cls, name, extra in ((bank_snapshot.Snapshot, "write", snapshot_write),
+                             (bank_journal.Journal, "sync", journal_sync)):
+        originals.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, extra(cls.__dict__[name], metrics))
+    active = metrics
+    return metrics
+
+def disable():
+    global active
+    while originals:
+        cls, name, original = originals.pop()
+        setattr(cls, name, original)
+    active = None
+
+# Sampling profiler writing every thread's stack in the collapsed format read
+# by flamegraph.pl and speedscope ("frame;frame;frame count" per line). When
+# started from the main thread on Unix it samples on a CPU-time timer signal,
+# which interrupts Python code wherever it is; otherwise a sampler thread wakes
+# every interval, which biases samples towards points that release the GIL.
+class Profiler:
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.stacks = Counter()
+        self.names = {}
+        self.stopping = threading.Event()
+        self.thread = None
+        self.previous_handler = None
+
+    def start(self):
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.previous_handler = signal.signal(signal.SIGPROF, self.on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.thread = threading.Thread(target=self.sample_loop, name="bank-profiler", daemon=True)
+            self.thread.start()
+        return self
+
+    def on_signal(self, signum, frame):
+        self.sample(frame)
+
+    def sample_loop(self):
+        while not self.stopping.wait(self.interval):
+            self.sample()
+
+    def sample(self, main_frame=None):
+        own = threading.get_ident()
+        main = threading.main_thread().ident
+        frames = sys._current_frames()
+        if len(frames) != len(self.names):
+            self.names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            if ident == own and main_frame is None:
+                continue
+            if ident == main and main_frame is not None:
+                frame = main_frame
+            stack = []
+            while frame:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(self.names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        if self.thread:
+            self.stopping.set()
+            self.thread.join()
+        else:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            if threading.current_thread() is threading.main_thread():
+                signal.signal(signal.SIGPROF, self.previous_handler)
+        with open(self.path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def profile(path, seconds, interval=0.005):
+    # Samples the running process for a fixed window, e.g. the first minute of
+    # a server run, and writes the stacks when the window closes
+    profiler = Profiler(path, interval).start()
+    timer = threading.Timer(seconds, profiler.stop)
+    timer.daemon = True
+    timer.start()
+    return profiler
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+ROUNDS = 4
+
+def luhn_digit(number):
+    total = 0
+    for i, digit in enumerate(reversed(str(number))):
+        value = int(digit)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return (10 - total % 10) % 10
+
+# Hands out account numbers in a keyed pseudo-random order without retries:
+# the i-th number is a Feistel permutation of i over the digits-wide space
+# (cycle-walked into range), so allocation stays O(1) however full the book
+# is. Once every number has been issued, numbers released by removed accounts
+# are reused oldest first. With check_digit a Luhn digit is appended.
+class AccountNumberAllocator:
+    def __init__(self, digits=6, check_digit=False, key=None, next_index=0, released=()):
+        self.low = 10 ** (digits - 1)
+        self.space = 9 * self.low
+        self.check_digit = check_digit
+        bits = (self.space - 1).bit_length()
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.key = key or os.urandom(16)
+        self.next_index = next_index
+        self.released = dict.fromkeys(released)
+
+    def round_value(self, round_number, value):
+        digest = hashlib.blake2b(value.to_bytes(8, "little"), digest_size=8, key=self.key,
+                                 salt=round_number.to_bytes(16, "little")).digest()
+        return int.from_bytes(digest, "little") & self.mask
+
+    def permute(self, index):
+        value = index
+        while True:
+            left, right = value >> self.half, value & self.mask
+            for round_number in range(ROUNDS):
+                left, right = right, left ^ self.round_value(round_number, right)
+            value = (left << self.half) | right
+            if value < self.space:
+                return value
+
+    def encode(self, value):
+        number = self.low + value
+        if self.check_digit:
+            return number * 10 + luhn_digit(number)
+        return number
+
+    def valid(self, number):
+        if self.check_digit:
+            return luhn_digit(number // 10) == number % 10 and self.low * 10 <= number < self.low * 100
+        return self.low <= number < self.low * 10
+
+    def allocate(self, taken):
+        # Numbers already in use, e.g. drawn before the allocator existed, are
+        # skipped; each index is visited once, so the skips are bounded.
+        # Returns None when the space is exhausted.
+        while self.next_index < self.space:
+            number = self.encode(self.permute(self.next_index))
+            self.next_index += 1
+            if number not in taken:
+                return number
+        while self.released:
+            number = next(iter(self.released))
+            del self.released[number]
+            if number not in taken:
+                return number
+        return None
+
+    def release(self, number):
+        self.released[number] = None
+
+    def claim(self, number, next_index):
+        # Journal replay of an allocation
+        self.released.pop(number, None)
+        self.next_index = max(self.next_index, next_index)
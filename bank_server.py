@@ -0,0 +1,188 @@
+# Asyncio front-end for BankSystem speaking newline-delimited JSON over TCP.
+#   python bank_server.py --port 8765
+# Each request is one line such as
+#   {"id": 1, "op": "login", "id_number": "42", "password": "..."}
+#   {"id": 2, "op": "deposit", "token": "<token from login>", "amount": 500}
+# and gets one response line {"id": 1, "ok": true, "result": ...} or
+# {"id": 1, "ok": false, "error": "..."}. login and create_account return a
+# session token that authorizes every other operation. Connections stay open for any number
+# of requests, and clients may pipeline: requests on one connection are
+# applied and answered in order while other connections proceed in parallel.
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bank_metrics
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException
+
+class BankService:
+    def __init__(self, bank, workers=8):
+        self.bank = bank
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="bank-worker")
+        self.operations = {
+            "create_account": self.create_account,
+            "login": self.login,
+            "deposit": self.deposit,
+            "withdraw": self.withdraw,
+            "transfer": self.transfer,
+            "apply_interest": self.apply_interest,
+            "export_transactions": self.export_transactions,
+            "remove_account": self.remove_account,
+        }
+
+    def summary(self, account):
+        return {
+            "id_number": account.id_number,
+            "name": account.name,
+            "account_number": account.account_number,
+            "account_type": account.account_type,
+            "balance": account.balance,
+            "is_locked": account.is_locked,
+        }
+
+    def amount(self, request, field="amount"):
+        value = float(request[field])
+        if not math.isfinite(value):
+            raise ValueError(value)
+        return value
+
+    def create_account(self, request):
+        account = self.bank.create_account(request["id_number"], request["name"], self.amount(request, "initial_deposit"),
+                                           request["account_type"], request["password"])
+        return dict(self.summary(account), token=self.bank.sessions.issue(account.id_number))
+
+    def login(self, request):
+        token = self.bank.open_session(request["id_number"], request["password"])
+        return dict(self.summary(self.bank.get_account(request["id_number"])), token=token)
+
+    def deposit(self, request):
+        account = self.bank.authorize(request["token"])
+        return {"message": self.bank.deposit(account, self.amount(request)), "balance": account.balance}
+
+    def withdraw(self, request):
+        account = self.bank.authorize(request["token"])
+        return {"message": self.bank.withdraw(account, self.amount(request)), "balance": account.balance}
+
+    def transfer(self, request):
+        account = self.bank.authorize(request["token"])
+        target = self.bank.get_account_by_number(int(request["to_account_number"]))
+        return {"message": self.bank.transfer(account, target, self.amount(request)), "balance": account.balance}
+
+    def apply_interest(self, request):
+        account = self.bank.authorize(request["token"])
+        return {"message": self.bank.apply_interest(account, request.get("period")), "balance": account.balance}
+
+    def export_transactions(self, request):
+        return {"filename": self.bank.export_transactions(self.bank.authorize(request["token"]))}
+
+    def remove_account(self, request):
+        return {"message": self.bank.remove_account(self.bank.authorize(request["token"]).id_number)}
+
+    def handle(self, line):
+        # Runs on a worker thread, so blocking persistence never stalls the event loop
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request is not a JSON object")
+            request_id = request.get("id")
+            operation = self.operations.get(request.get("op"))
+            if operation is None:
+                raise BankingException(f"Unknown operation {request.get('op')!r}")
+            response = {"id": request_id, "ok": True, "result": operation(request)}
+        except KeyError as e:
+            response = {"id": request_id, "ok": False, "error": f"Missing field {e}"}
+        except (TypeError, ValueError):
+            response = {"id": request_id, "ok": False, "error": "Malformed request"}
+        except BankingException as e:
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        except Exception as e:
+            # Any other failure (e.g. a field of the wrong type) answers this
+            # request instead of dropping the connection and the requests behind it
+            response = {"id": request_id, "ok": False, "error": f"Request failed: {type(e).__name__}"}
+        return json.dumps(response).encode() + b"\n"
+
+    async def serve_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(await loop.run_in_executor(self.executor, self.handle, line))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def export_metrics(self, metrics, path, interval):
+        while True:
+            await asyncio.sleep(interval)
+            metrics.write_prometheus(path)
+
+    async def serve(self, host, port, metrics=None, metrics_path=None, metrics_interval=10.0):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:
+                pass
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        exporter = None
+        if metrics and metrics_path:
+            exporter = asyncio.create_task(self.export_metrics(metrics, metrics_path, metrics_interval))
+        async with server:
+            print(f"Banking service listening on {host}:{port}", flush=True)
+            await stop.wait()
+        if exporter:
+            exporter.cancel()
+            metrics.write_prometheus(metrics_path)
+
+    def close(self):
+        self.executor.shutdown()
+        self.bank.close()
+        if self.bank.password_hasher.executor:
+            self.bank.password_hasher.executor.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve BankSystem over newline-delimited JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--sync-policy", default="always", choices=["always", "group", "interval"])
+    parser.add_argument("--lazy", action="store_true", help="load accounts on first use instead of at startup")
+    parser.add_argument("--password-scheme", default="pbkdf2_sha256", choices=["pbkdf2_sha256", "scrypt"])
+    parser.add_argument("--kdf-iterations", type=int, default=260000, help="PBKDF2 iterations")
+    parser.add_argument("--kdf-processes", type=int, default=None, help="password hashing worker processes")
+    parser.add_argument("--metrics", help="enable instrumentation and write Prometheus text to this file")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between metrics writes")
+    parser.add_argument("--profile", help="write sampled stacks in collapsed (flamegraph) format to this file")
+    parser.add_argument("--profile-seconds", type=float, default=30.0, help="sampling window for --profile")
+    args = parser.parse_args()
+    metrics = bank_metrics.enable() if args.metrics else None
+    if args.profile:
+        bank_metrics.profile(args.profile, args.profile_seconds)
+    # Password hashing runs in worker processes so a slow KDF never holds the GIL
+    # that the request threads need
+    kdf_pool = ProcessPoolExecutor(args.kdf_processes, mp_context=multiprocessing.get_context("spawn"))
+    hasher = PasswordHasher(args.password_scheme, args.kdf_iterations, executor=kdf_pool)
+    bank = BankSystem(args.data_dir, sync_policy=args.sync_policy, background=True, password_hasher=hasher,
+                      lazy=args.lazy)
+    service = BankService(bank, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port, metrics, args.metrics, args.metrics_interval))
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
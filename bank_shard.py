@@ -0,0 +1,691 @@
+# Sharded BankSystem: accounts are partitioned by a hash of their ID number
+# across worker processes, each owning a BankSystem store in its own directory
+# (DATA_DIR/shard-00, shard-01, ...), so operations on different shards run on
+# different cores. ShardedBank is the router. It forwards operations to the
+# owning shard over a pipe, fans whole-book operations out to every shard in
+# parallel and merges the results, and allocates account numbers for the whole
+# book so they stay unique. Operations take and return plain values (ID
+# numbers, account summaries as dicts), since accounts live in their shard.
+#   bank = ShardedBank("bank_shards", shards=4)
+#   bank.create_account("42", "Jane Doe", 5000, "Basic", "secret")
+#   bank.deposit("42", 500)
+# The shard count is fixed once a book is created; change it offline with
+#   python bank_shard.py bank_shards --shards 8
+# A transfer between two shards is committed in two phases: the router
+# journals the intent in DATA_DIR/transfers_journal.txt, the source shard
+# debits and the target shard credits (or, if the credit is refused, the
+# source is refunded), then the router journals the end. Shards apply each leg
+# at most once, so a transfer cut short by a crash is finished when the book
+# is next opened.
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from datetime import datetime
+from multiprocessing.reduction import ForkingPickler
+
+import bank_core
+import bank_export
+from bank_core import BankSystem, BankingException, AccountNumbersExhaustedException, current_period
+from bank_journal import Journal
+from bank_numbers import AccountNumberAllocator
+from bank_snapshot import Snapshot
+
+LAYOUT_FILE = "shards.json"
+# Present while a rebalance moves shard directories; the book cannot be opened
+REBALANCE_FILE = "rebalance.json"
+BUILD_DIR = "rebalance.tmp"
+TRANSFER_JOURNAL = "transfers_journal.txt"
+# The transfer journal is emptied when this many records cover no open transfer
+TRANSFER_JOURNAL_RECORDS = 10000
+# Most requests shipped to a shard in one message (and one journal fsync)
+MAX_BATCH = 1000
+STORE_PREFIXES = ("bank_data", "bank_transactions", "bank_journal", "export_watermarks")
+
+def shard_of(id_number, shards):
+    # A fixed hash (not hash(), which is salted per process) so every process
+    # and every restart agrees on the owner
+    digest = hashlib.blake2b(str(id_number).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+def shard_path(data_dir, index):
+    return os.path.join(data_dir, f"shard-{index:02d}")
+
+def read_layout(data_dir, name=LAYOUT_FILE):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_layout(data_dir, layout, name=LAYOUT_FILE):
+    path = os.path.join(data_dir, name)
+    with open(path + ".tmp", "w") as f:
+        json.dump(layout, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def open_transfers(journal):
+    # Transfers between shards begun and not ended, by ID, from the router's journal
+    transfers = {}
+    for record in journal.replay():
+        if record["op"] == "begin":
+            transfers[record["id"]] = {key: value for key, value in record.items() if key not in ("op", "seq")}
+        else:
+            transfers.pop(record["id"], None)
+    return transfers
+
+def summary(account):
+    return {
+        "id_number": account.id_number,
+        "name": account.name,
+        "balance": account.balance,
+        "account_number": account.account_number,
+        "account_type": account.account_type,
+        "failed_withdrawals": account.failed_withdrawals,
+        "is_locked": account.is_locked,
+        "interest_period": account.interest_period
+    }
+
+# Runs in the shard process. Every operation takes and returns picklable
+# values; the router calls them by name.
+class ShardWorker:
+    def __init__(self, path, options):
+        self.bank = BankSystem(path, **options)
+
+    def account(self, id_number):
+        return self.bank.get_account(id_number)
+
+    def create_account(self, id_number, name, initial_deposit, account_type, password, account_number, next_number):
+        return summary(self.bank.create_account(id_number, name, initial_deposit, account_type, password,
+                                                account_number, next_number))
+
+    def login(self, id_number, password):
+        return summary(self.bank.login(id_number, password))
+
+    def get_account(self, id_number):
+        return summary(self.account(id_number))
+
+    def history(self, id_number, count):
+        log = self.account(id_number).transaction_log
+        return [trans.to_dict() for trans in log[max(0, len(log) - count):]]
+
+    def deposit(self, id_number, amount):
+        return self.bank.deposit(self.account(id_number), amount)
+
+    def withdraw(self, id_number, amount):
+        return self.bank.withdraw(self.account(id_number), amount)
+
+    def transfer(self, id_number, to_id_number, amount):
+        return self.bank.transfer(self.account(id_number), self.account(to_id_number), amount)
+
+    def transfer_leg(self, id_number, leg_id, amount, description, debit):
+        return self.bank.transfer_leg(self.account(id_number), leg_id, amount, description, debit)
+
+    def transfer_applied(self, leg_id):
+        return self.bank.transfer_applied(leg_id)
+
+    def forget_transfers(self, leg_ids):
+        self.bank.forget_transfers(leg_ids)
+
+    def apply_interest(self, id_number, period):
+        return self.bank.apply_interest(self.account(id_number), period)
+
+    def apply_interest_batch(self, period):
+        return self.bank.apply_interest_batch(period)
+
+    def post_batch(self, rows, batch_size):
+        return self.bank.post_batch(rows, batch_size, start=0)
+
+    def remove_account(self, id_number):
+        account_number = self.account(id_number).account_number
+        return self.bank.remove_account(id_number), account_number
+
+    def find_accounts(self, criteria):
+        return [summary(account) for account in self.bank.find_accounts(**criteria)]
+
+    def export_transactions(self, id_number):
+        return self.bank.export_transactions(self.account(id_number))
+
+    def export_range(self, path, start, end, id_numbers, file_format, watermark):
+        return bank_export.export_range(self.bank, path, start, end, id_numbers, file_format, watermark)
+
+    def save_data(self):
+        self.bank.save_data()
+
+    def allocator_state(self):
+        allocator = self.bank.allocator
+        return array("q", self.bank.account_numbers), allocator.next_index, list(allocator.released)
+
+def serve_shard(requests, responses, path, options):
+    # Each message is a list of (operation, args); the records it writes share
+    # one journal fsync, made before the results are sent back
+    worker = ShardWorker(path, options)
+    journal = worker.bank.journal
+    try:
+        while True:
+            try:
+                batch = requests.recv()
+            except EOFError:
+                break
+            if batch is None:
+                break
+            results = []
+            journal.begin_batch()
+            try:
+                for name, args in batch:
+                    try:
+                        results.append((True, getattr(worker, name)(*args)))
+                    except Exception as e:
+                        results.append((False, (type(e).__name__, str(e))))
+            finally:
+                journal.commit_batch()
+            responses.send(results)
+    finally:
+        worker.bank.close()
+
+def fail(future, error):
+    # The sender and the receiver may both give up on the same request
+    try:
+        future.set_exception(error)
+    except InvalidStateError:
+        pass
+
+def remote_error(index, name, message):
+    # Banking rule violations keep their type; anything else is a shard fault
+    cls = getattr(bank_core, name, None)
+    if isinstance(cls, type) and issubclass(cls, BankingException):
+        return cls(message)
+    return RuntimeError(f"Shard {index} failed: {name}: {message}")
+
+# Router end of one shard. Calls from any thread are queued; a sender thread
+# ships everything queued so far as one message, so concurrent callers share a
+# round trip and the shard's fsync, and a receiver thread resolves their
+# futures in order. Once the shard is gone (its pipe broke or it exited),
+# every unanswered and every later request fails instead of waiting forever.
+class ShardClient:
+    def __init__(self, context, index, path, options):
+        self.index = index
+        request_reader, self.request_writer = context.Pipe(duplex=False)
+        self.response_reader, response_writer = context.Pipe(duplex=False)
+        self.process = context.Process(target=serve_shard, args=(request_reader, response_writer, path, options),
+                                       name=f"bank-shard-{index}", daemon=True)
+        self.process.start()
+        request_reader.close()
+        response_writer.close()
+        self.requests = queue.SimpleQueue()
+        self.inflight = deque()
+        self.error = None
+        self.sender = threading.Thread(target=self.send_loop, name=f"bank-shard-{index}-send", daemon=True)
+        self.receiver = threading.Thread(target=self.receive_loop, name=f"bank-shard-{index}-receive", daemon=True)
+        self.sender.start()
+        self.receiver.start()
+
+    def submit(self, name, *args):
+        future = Future()
+        self.requests.put((name, args, future))
+        return future
+
+    def send_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self.requests.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [request for request in batch if request is not None]
+            if batch:
+                self.send_batch(batch)
+        if self.error is None:
+            try:
+                self.request_writer.send(None)
+            except OSError:
+                pass
+
+    def send_batch(self, batch):
+        if self.error is not None:
+            for _, _, future in batch:
+                fail(future, self.error)
+            return
+        try:
+            message = ForkingPickler.dumps([(name, args) for name, args, _ in batch])
+        except Exception as e:
+            # Arguments that cannot be pickled fail this batch only
+            for _, _, future in batch:
+                fail(future, e)
+            return
+        # Registered before sending, so the receiver always finds them
+        self.inflight.extend(future for _, _, future in batch)
+        try:
+            self.request_writer.send_bytes(message)
+        except Exception as e:
+            self.error = self.error or RuntimeError(f"Shard {self.index} is unavailable: {e!r}")
+            for _, _, future in batch:
+                fail(future, self.error)
+
+    def receive_loop(self):
+        while True:
+            try:
+                results = self.response_reader.recv()
+            except (EOFError, OSError):
+                break
+            for ok, value in results:
+                future = self.inflight.popleft()
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(remote_error(self.index, *value))
+        self.error = self.error or RuntimeError(f"Shard {self.index} exited")
+        while self.inflight:
+            fail(self.inflight.popleft(), self.error)
+
+    def close(self):
+        self.requests.put(None)
+        self.sender.join()
+        # Also stops a shard the sender could not reach with the shutdown message
+        self.request_writer.close()
+        self.process.join()
+        self.receiver.join()
+        self.response_reader.close()
+
+class ShardedBank:
+    # options are passed to every shard's BankSystem (sync_policy,
+    # password_hasher, lazy, ...); a new book needs shards, an existing one
+    # keeps the count it was created or rebalanced with
+    def __init__(self, data_dir, shards=None, **options):
+        plan = read_layout(data_dir, REBALANCE_FILE)
+        if plan is not None:
+            raise ValueError(f"A rebalance of {data_dir} did not finish; complete it with: "
+                             f"python bank_shard.py {data_dir} --shards {plan['shards']}")
+        layout = read_layout(data_dir)
+        if layout is None:
+            if os.path.isdir(data_dir) and any(name.startswith("bank_data") for name in os.listdir(data_dir)):
+                raise ValueError(f"{data_dir} holds an unsharded store; split it with: "
+                                 f"python bank_shard.py {data_dir} --shards N")
+            layout = {"shards": shards or os.cpu_count() or 1, "key": os.urandom(16).hex()}
+            for i in range(layout["shards"]):
+                os.makedirs(shard_path(data_dir, i), exist_ok=True)
+            write_layout(data_dir, layout)
+        elif shards is not None and shards != layout["shards"]:
+            raise ValueError(f"{data_dir} has {layout['shards']} shards; change the count offline with: "
+                             f"python bank_shard.py {data_dir} --shards {shards}")
+        self.data_dir = data_dir
+        self.shards = layout["shards"]
+        context = multiprocessing.get_context("spawn")
+        self.clients = [ShardClient(context, i, shard_path(data_dir, i), options) for i in range(self.shards)]
+        # Account numbers are allocated here, for the whole book, with the
+        # permutation key from the layout; each shard journals the numbers it
+        # was given, so the allocator state is rebuilt from them on startup
+        self.numbers = set()
+        next_index = 0
+        released = []
+        for numbers, shard_next, shard_released in self.fan_out("allocator_state"):
+            self.numbers.update(numbers)
+            next_index = max(next_index, shard_next)
+            released += shard_released
+        self.allocator = AccountNumberAllocator(options.get("account_digits", 6), options.get("check_digit", False),
+                                                bytes.fromhex(layout["key"]), next_index,
+                                                [number for number in released if number not in self.numbers])
+        self.allocator_lock = threading.Lock()
+        self.transfers = {}
+        self.transfer_lock = threading.Lock()
+        self.transfer_journal = Journal(os.path.join(data_dir, TRANSFER_JOURNAL), background=True)
+        try:
+            self.recover_transfers()
+        except BaseException:
+            self.close()
+            raise
+
+    def client(self, id_number):
+        return self.clients[shard_of(id_number, self.shards)]
+
+    def call(self, id_number, name, *args):
+        return self.client(id_number).submit(name, id_number, *args).result()
+
+    def fan_out(self, name, *args):
+        futures = [client.submit(name, *args) for client in self.clients]
+        return [future.result() for future in futures]
+
+    def create_account(self, id_number, name, initial_deposit, account_type, password):
+        with self.allocator_lock:
+            account_number = self.allocator.allocate(self.numbers)
+            if account_number is None:
+                raise AccountNumbersExhaustedException("No account numbers left")
+            self.numbers.add(account_number)
+            next_number = self.allocator.next_index
+        try:
+            return self.call(id_number, "create_account", name, initial_deposit, account_type, password,
+                             account_number, next_number)
+        except Exception:
+            with self.allocator_lock:
+                self.numbers.discard(account_number)
+                self.allocator.release(account_number)
+            raise
+
+    def login(self, id_number, password):
+        return self.call(id_number, "login", password)
+
+    def get_account(self, id_number):
+        return self.call(id_number, "get_account")
+
+    def history(self, id_number, count=200):
+        return self.call(id_number, "history", count)
+
+    def deposit(self, id_number, amount):
+        return self.call(id_number, "deposit", amount)
+
+    def withdraw(self, id_number, amount):
+        return self.call(id_number, "withdraw", amount)
+
+    def transfer(self, id_number, to_id_number, amount):
+        # Atomic within a shard; across shards in two phases, see the top of the file
+        if shard_of(id_number, self.shards) == shard_of(to_id_number, self.shards):
+            return self.call(id_number, "transfer", to_id_number, amount)
+        source = self.client(id_number).submit("get_account", id_number)
+        target = self.client(to_id_number).submit("get_account", to_id_number)
+        intent = {
+            "id": os.urandom(16).hex(),
+            "from": id_number,
+            "to": to_id_number,
+            "amount": amount,
+            "from_number": source.result()["account_number"],
+            "to_number": target.result()["account_number"]
+        }
+        self.begin_transfer(intent)
+        try:
+            self.call(id_number, "transfer_leg", intent["id"] + "/debit", amount,
+                      f"Transfer to {intent['to_number']}", True)
+        except BankingException:
+            # Refused by the source, so nothing was debited
+            self.end_transfer(intent, [])
+            raise
+        self.finish_transfer(intent)
+        return f"Transferred {amount} HUF to account {intent['to_number']}"
+
+    def begin_transfer(self, intent):
+        with self.transfer_lock:
+            seq = self.transfer_journal.append({"op": "begin", **intent})
+            self.transfers[intent["id"]] = intent
+        self.transfer_journal.wait_durable(seq)
+
+    def finish_transfer(self, intent):
+        # Credits the target, or refunds the source if the target refuses the
+        # credit (e.g. it was removed meanwhile). A shard failure leaves the
+        # transfer open, for recover_transfers to finish.
+        transfer_id = intent["id"]
+        try:
+            self.call(intent["to"], "transfer_leg", transfer_id + "/credit", intent["amount"],
+                      f"Transfer from {intent['from_number']}", False)
+        except BankingException:
+            self.call(intent["from"], "transfer_leg", transfer_id + "/refund", intent["amount"],
+                      f"Refund of transfer to {intent['to_number']}", False)
+            self.end_transfer(intent, ["/debit", "/refund"])
+            raise
+        self.end_transfer(intent, ["/debit"], ["/credit"])
+
+    def end_transfer(self, intent, source_legs, target_legs=()):
+        with self.transfer_lock:
+            seq = self.transfer_journal.append({"op": "end", "id": intent["id"]})
+            del self.transfers[intent["id"]]
+        self.transfer_journal.wait_durable(seq)
+        # Only once the end is durable can the shards drop the leg IDs: no
+        # recovery will repeat a leg of this transfer after that
+        for id_number, legs in ((intent["from"], source_legs), (intent["to"], target_legs)):
+            if legs:
+                self.client(id_number).submit("forget_transfers", [intent["id"] + leg for leg in legs])
+        with self.transfer_lock:
+            if not self.transfers and self.transfer_journal.records >= TRANSFER_JOURNAL_RECORDS:
+                self.transfer_journal.reset()
+
+    def recover_transfers(self):
+        # Transfers begun but not ended when the router stopped are finished:
+        # refunded ones and ones never debited are only ended, debited ones
+        # are credited (or refunded). Then every shard forgets its leg IDs.
+        self.transfers = open_transfers(self.transfer_journal)
+        self.transfer_journal.open()
+        for intent in list(self.transfers.values()):
+            source = self.client(intent["from"])
+            if (source.submit("transfer_applied", intent["id"] + "/debit").result() and
+                    not source.submit("transfer_applied", intent["id"] + "/refund").result()):
+                try:
+                    self.finish_transfer(intent)
+                except BankingException:
+                    pass
+            else:
+                self.end_transfer(intent, [])
+        self.fan_out("forget_transfers", None)
+        self.transfer_journal.reset()
+
+    def apply_interest(self, id_number, period=None):
+        return self.call(id_number, "apply_interest", period or current_period())
+
+    def apply_interest_batch(self, period=None):
+        # Every shard credits its accounts in parallel, for the same period
+        results = self.fan_out("apply_interest_batch", period or current_period())
+        return sum(count for count, _ in results), sum(total for _, total in results)
+
+    def remove_account(self, id_number):
+        message, account_number = self.call(id_number, "remove_account")
+        with self.allocator_lock:
+            self.numbers.discard(account_number)
+            self.allocator.release(account_number)
+        return message
+
+    def find_accounts(self, **criteria):
+        return [account for accounts in self.fan_out("find_accounts", criteria) for account in accounts]
+
+    def get_account_by_number(self, account_number):
+        # Checked here so a mistyped number is not sent to every shard
+        if not self.allocator.valid(account_number):
+            raise bank_core.AccountNotFoundException("Invalid account number")
+        accounts = self.find_accounts(account_number=account_number)
+        if not accounts:
+            raise bank_core.AccountNotFoundException("Account not found")
+        return accounts[0]
+
+    def export_transactions(self, id_number):
+        return self.call(id_number, "export_transactions")
+
+    def export_range(self, path, start=None, end=None, id_numbers=None, file_format="csv", watermark=None):
+        # Each shard writes its part in parallel; the parts are concatenated
+        # under one header (every export format is a header plus records)
+        if file_format not in bank_export.FORMATS:
+            raise ValueError(f"Export format must be one of {', '.join(bank_export.FORMATS)}")
+        header = bank_export.WRITERS[file_format].header
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as parts_dir:
+            futures = []
+            for i, client in enumerate(self.clients):
+                shard_ids = None
+                if id_numbers is not None:
+                    shard_ids = [id_number for id_number in id_numbers if shard_of(id_number, self.shards) == i]
+                    if not shard_ids:
+                        continue
+                part_path = os.path.join(parts_dir, f"part{i}")
+                futures.append(client.submit("export_range", part_path, start, end, shard_ids, file_format, watermark))
+            part_paths = [future.result() for future in futures]
+            with open(path, "wb") as out:
+                out.write(header)
+                for part_path in part_paths:
+                    with open(part_path, "rb") as part:
+                        part.seek(len(header))
+                        shutil.copyfileobj(part, out)
+        return path
+
+    def post_batch(self, operations, batch_size=1000, start=1):
+        # Rows are split by shard and shipped batch_size at a time; each shard
+        # applies its rows in file order with one fsync per chunk. A transfer
+        # between shards waits for the rows shipped before it and then runs
+        # through the router. Rejections carry the row numbers of the input.
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        applied = 0
+        rejections = []
+        chunks = [[] for _ in self.clients]
+        futures = []
+
+        def ship(i):
+            numbers = [row_number for row_number, _ in chunks[i]]
+            rows = [row for _, row in chunks[i]]
+            futures.append((numbers, self.clients[i].submit("post_batch", rows, batch_size)))
+            chunks[i] = []
+
+        def collect():
+            nonlocal applied
+            for numbers, future in futures:
+                chunk_applied, chunk_rejections = future.result()
+                applied += chunk_applied
+                rejections.extend((numbers[index], reason) for index, reason in chunk_rejections)
+            del futures[:]
+
+        for row_number, row in enumerate(operations, start):
+            try:
+                i = shard_of(row["id_number"], self.shards)
+                if row.get("operation") == "transfer" and shard_of(row["to_id_number"], self.shards) != i:
+                    for j in (i, shard_of(row["to_id_number"], self.shards)):
+                        if chunks[j]:
+                            ship(j)
+                    collect()
+                    amount = float(row["amount"])
+                    if not math.isfinite(amount):
+                        raise ValueError(amount)
+                    self.transfer(row["id_number"], row["to_id_number"], amount)
+                    applied += 1
+                    continue
+            except KeyError as e:
+                rejections.append((row_number, f"Missing field {e}"))
+                continue
+            except (TypeError, ValueError):
+                rejections.append((row_number, "Amount must be a valid number"))
+                continue
+            except BankingException as e:
+                rejections.append((row_number, str(e)))
+                continue
+            chunks[i].append((row_number, row))
+            if len(chunks[i]) >= batch_size:
+                ship(i)
+        for i in range(len(chunks)):
+            if chunks[i]:
+                ship(i)
+        collect()
+        rejections.sort()
+        return applied, rejections
+
+    def save_data(self):
+        self.fan_out("save_data")
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.transfer_journal.close()
+
+def rebalance(data_dir, shards):
+    # Offline: re-partitions an unsharded store, or a sharded book, into the
+    # given number of shards. New shards are built next to the old files,
+    # which are then moved to a pre-rebalance-<time> directory as a backup.
+    # Returns the number of accounts moved (None when an interrupted
+    # rebalance was completed) and the backup directory.
+    plan = read_layout(data_dir, REBALANCE_FILE)
+    if plan is not None:
+        if plan["shards"] != shards:
+            raise ValueError(f"A rebalance of {data_dir} to {plan['shards']} shards did not finish; complete it "
+                             f"first with: python bank_shard.py {data_dir} --shards {plan['shards']}")
+        finish_rebalance(data_dir, plan)
+        return None, os.path.join(data_dir, plan["backup"])
+    layout = read_layout(data_dir)
+    if layout and open_transfers(Journal(os.path.join(data_dir, TRANSFER_JOURNAL))):
+        raise ValueError(f"{data_dir} has unfinished transfers between shards; open it once with ShardedBank "
+                         f"to finish them, then rebalance")
+    sources = [shard_path(data_dir, i) for i in range(layout["shards"])] if layout else [data_dir]
+    building = os.path.join(data_dir, BUILD_DIR)
+    shutil.rmtree(building, ignore_errors=True)
+    snapshots = []
+    for i in range(shards):
+        os.makedirs(shard_path(building, i))
+        snapshot = Snapshot(0, 1)
+        snapshot.open_records(shard_path(building, i))
+        snapshots.append(snapshot)
+    key = bytes.fromhex(layout["key"]) if layout else None
+    next_index = 0
+    released = set()
+    numbers = set()
+    moved = 0
+    for source in sources:
+        # Lazy, so accounts are copied from the record file without being built
+        bank = BankSystem(source, lazy=True)
+        key = key or bank.allocator.key
+        next_index = max(next_index, bank.allocator.next_index)
+        released.update(bank.allocator.released)
+        numbers.update(bank.account_numbers)
+        for entry in bank.snapshot_entries(*bank.accounts.split()):
+            snapshots[shard_of(entry[0], shards)].add_account(*entry)
+            moved += 1
+        bank.close()
+    for i, snapshot in enumerate(snapshots):
+        # The router allocates from the largest next index; released numbers
+        # go to one shard only, so none is handed out twice
+        snapshot.allocator_key = key.hex()
+        snapshot.allocator_next = next_index
+        if i == 0:
+            snapshot.released_numbers = array("q", sorted(released - numbers))
+        snapshot.write(os.path.join(shard_path(building, i), "bank_data.bin"))
+    # From here on the book is in neither layout until the plan is carried out
+    plan = {
+        "shards": shards,
+        "key": key.hex(),
+        "old_shards": layout["shards"] if layout else 0,
+        "backup": f"pre-rebalance-{datetime.now():%Y%m%d-%H%M%S}"
+    }
+    write_layout(data_dir, plan, REBALANCE_FILE)
+    finish_rebalance(data_dir, plan)
+    return moved, os.path.join(data_dir, plan["backup"])
+
+def finish_rebalance(data_dir, plan):
+    # Every step can be repeated, so running it again after a crash completes
+    # the move: the old files go to the backup only while no new shard has
+    # been moved in yet, then the new shards go in and the layout is written
+    building = os.path.join(data_dir, BUILD_DIR)
+    backup = os.path.join(data_dir, plan["backup"])
+    os.makedirs(backup, exist_ok=True)
+    if all(os.path.isdir(shard_path(building, i)) for i in range(plan["shards"])):
+        if plan["old_shards"]:
+            for i in range(plan["old_shards"]):
+                if os.path.isdir(shard_path(data_dir, i)):
+                    os.replace(shard_path(data_dir, i), shard_path(backup, i))
+            if os.path.exists(os.path.join(data_dir, LAYOUT_FILE)):
+                os.replace(os.path.join(data_dir, LAYOUT_FILE), os.path.join(backup, LAYOUT_FILE))
+        else:
+            for name in os.listdir(data_dir):
+                if name.startswith(STORE_PREFIXES):
+                    os.replace(os.path.join(data_dir, name), os.path.join(backup, name))
+    for i in range(plan["shards"]):
+        if os.path.isdir(shard_path(building, i)):
+            os.replace(shard_path(building, i), shard_path(data_dir, i))
+    write_layout(data_dir, {"shards": plan["shards"], "key": plan["key"]})
+    if os.path.isdir(building):
+        os.rmdir(building)
+    os.remove(os.path.join(data_dir, REBALANCE_FILE))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a store into shards or change the shard count (offline)")
+    parser.add_argument("data_dir")
+    parser.add_argument("--shards", type=int, required=True)
+    args = parser.parse_args()
+    moved, backup = rebalance(args.data_dir, args.shards)
+    if moved is None:
+        print(f"Completed the interrupted rebalance into {args.shards} shards; previous files kept in {backup}")
+    else:
+        print(f"Moved {moved} accounts into {args.shards} shards; previous files kept in {backup}")
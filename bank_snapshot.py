@@ -0,0 +1,249 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+MAGIC = b"BANKSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sHQQ")
+SECTION = struct.Struct("<cQ")
+# Fixed-width transaction record: epoch seconds, amount, type code, description code
+RECORD = struct.Struct("<qdHI")
+EPOCH_FIELD = struct.Struct("<q")
+ACCOUNT_TYPES = ["Basic", "Premium"]
+
+# Epochs are real (UTC) seconds, so they only grow, also across a DST change;
+# naive datetimes are local time and are converted at the edges
+def to_epoch(timestamp):
+    return int(timestamp.timestamp())
+
+def from_epoch(seconds):
+    return datetime.fromtimestamp(seconds)
+
+# Snapshot sections: typed arrays stored little-endian, string columns NUL-joined
+def write_array(f, values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    data = values.tobytes()
+    f.write(SECTION.pack(values.typecode.encode(), len(data)))
+    f.write(data)
+
+def write_strings(f, values):
+    text = "\0".join(values)
+    if text.count("\0") != max(len(values) - 1, 0):
+        raise ValueError("Snapshot strings cannot contain NUL characters")
+    data = text.encode()
+    f.write(SECTION.pack(b"s", len(data)))
+    f.write(data)
+
+def read_section(f, count=0):
+    # count disambiguates a string column made only of empty strings
+    typecode, length = SECTION.unpack(f.read(SECTION.size))
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("Snapshot is truncated")
+    if typecode == b"s":
+        return data.decode().split("\0") if data else [""] * count
+    values = array(typecode.decode())
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def records_path(directory, generation):
+    return os.path.join(directory, f"bank_transactions.{generation}.bin")
+
+# Memory-mapped transaction records shared by every account's TransactionLog
+class TransactionFile:
+    def __init__(self, buffer, type_table, description_table, path=None):
+        self.buffer = buffer
+        self.type_table = type_table
+        self.description_table = description_table
+        self.path = path
+
+    @classmethod
+    def open(cls, path, type_table, description_table):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(b"", type_table, description_table, path)
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), type_table, description_table, path)
+
+    def record(self, index):
+        timestamp, amount, type_code, description_code = RECORD.unpack_from(self.buffer, index * RECORD.size)
+        return self.type_table[type_code], amount, timestamp, self.description_table[description_code]
+
+    def epoch(self, index):
+        return EPOCH_FIELD.unpack_from(self.buffer, index * RECORD.size)[0]
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = b""
+
+# Column-oriented snapshot of every account; transaction history lives in a
+# separate fixed-width record file named after the snapshot generation so an
+# interrupted compaction never leaves the snapshot pointing at the wrong file
+class Snapshot:
+    def __init__(self, journal_seq=0, generation=0):
+        self.journal_seq = journal_seq
+        self.generation = generation
+        self.ids = []
+        self.names = []
+        self.password_hashes = []
+        self.balances = array("d")
+        self.account_numbers = array("q")
+        self.account_types = array("B")
+        self.failed_withdrawals = array("I")
+        self.locked = array("B")
+        self.interest_periods = []
+        self.allocator_key = ""
+        self.allocator_next = 0
+        self.released_numbers = array("q")
+        self.transfer_legs = []
+        self.trans_offsets = array("Q")
+        self.trans_counts = array("I")
+        self.type_table = []
+        self.description_table = []
+        self.type_codes = {}
+        self.description_codes = {}
+        self.records_file = None
+        self.records_buffer = bytearray()
+        self.record_count = 0
+
+    def open_records(self, directory):
+        self.records_file = open(records_path(directory, self.generation) + ".tmp", "wb")
+
+    def add_account(self, id_number, name, password_hash, balance, account_number, account_type,
+                    failed_withdrawals, is_locked, interest_period, transactions):
+        self.ids.append(id_number)
+        self.names.append(name)
+        self.password_hashes.append(password_hash)
+        self.balances.append(balance)
+        self.account_numbers.append(account_number)
+        self.account_types.append(ACCOUNT_TYPES.index(account_type))
+        self.failed_withdrawals.append(failed_withdrawals)
+        self.locked.append(1 if is_locked else 0)
+        self.interest_periods.append(interest_period or "")
+        type_codes = self.type_codes
+        description_codes = self.description_codes
+        buffer = self.records_buffer
+        pack = RECORD.pack
+        count = 0
+        for trans_type, amount, timestamp, description in transactions:
+            if trans_type not in type_codes:
+                type_codes[trans_type] = len(self.type_table)
+                self.type_table.append(trans_type)
+            if description not in description_codes:
+                description_codes[description] = len(self.description_table)
+                self.description_table.append(description)
+            buffer += pack(timestamp, amount, type_codes[trans_type], description_codes[description])
+            count += 1
+        self.trans_offsets.append(self.record_count)
+        self.trans_counts.append(count)
+        self.record_count += count
+        if len(buffer) >= 1 << 20:
+            self.records_file.write(buffer)
+            del buffer[:]
+
+    def rows(self):
+        for i in range(len(self.ids)):
+            yield self.row(i)
+
+    def row(self, i):
+        # One account as a tuple ending with its (offset, count) in the record file
+        return (self.ids[i], self.names[i], self.password_hashes[i], self.balances[i],
+                self.account_numbers[i], ACCOUNT_TYPES[self.account_types[i]],
+                self.failed_withdrawals[i], bool(self.locked[i]),
+                self.interest_periods[i] or None, self.trans_offsets[i], self.trans_counts[i])
+
+    def write(self, path):
+        self.records_file.write(self.records_buffer)
+        self.records_file.flush()
+        os.fsync(self.records_file.fileno())
+        self.records_file.close()
+        os.replace(self.records_file.name, self.records_file.name[:-len(".tmp")])
+        del self.records_buffer[:]
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.journal_seq, self.generation))
+            for strings in (self.ids, self.names, self.password_hashes):
+                write_strings(f, strings)
+            for values in (self.balances, self.account_numbers, self.account_types,
+                           self.failed_withdrawals, self.locked, self.trans_offsets,
+                           self.trans_counts):
+                write_array(f, values)
+            write_strings(f, self.type_table)
+            write_strings(f, self.description_table)
+            write_strings(f, self.interest_periods)
+            write_strings(f, [self.allocator_key])
+            write_array(f, array("Q", [self.allocator_next]))
+            write_array(f, self.released_numbers)
+            write_strings(f, self.transfer_legs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def open_transactions(self, directory):
+        return TransactionFile.open(records_path(directory, self.generation), self.type_table, self.description_table)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            magic, version, journal_seq, generation = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a bank snapshot")
+            if version != VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            snapshot = cls(journal_seq, generation)
+            snapshot.ids = read_section(f)
+            snapshot.names = read_section(f, len(snapshot.ids))
+            snapshot.password_hashes = read_section(f, len(snapshot.ids))
+            snapshot.balances = read_section(f)
+            snapshot.account_numbers = read_section(f)
+            snapshot.account_types = read_section(f)
+            snapshot.failed_withdrawals = read_section(f)
+            snapshot.locked = read_section(f)
+            snapshot.trans_offsets = read_section(f)
+            snapshot.trans_counts = read_section(f)
+            snapshot.type_table = read_section(f)
+            snapshot.description_table = read_section(f)
+            snapshot.interest_periods = read_section(f, len(snapshot.ids))
+            snapshot.allocator_key = read_section(f, 1)[0]
+            snapshot.allocator_next = read_section(f)[0]
+            snapshot.released_numbers = read_section(f)
+            snapshot.transfer_legs = read_section(f)
+        return snapshot
+
+def migrate_text_data(text_path, snapshot_path):
+    # One-shot conversion of the legacy one-dict-per-line bank_data.txt format
+    import ast  # migration only, kept out of the core's import time
+    snapshot = Snapshot(generation=1)
+    snapshot.open_records(os.path.dirname(os.path.abspath(snapshot_path)))
+    with open(text_path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = ast.literal_eval(line.strip())
+            if "journal_seq" in data:
+                snapshot.journal_seq = data["journal_seq"]
+                continue
+            snapshot.add_account(
+                data["id_number"], data["name"], data["password_hash"], data["balance"],
+                data["account_number"], data["account_type"], data["failed_withdrawals"],
+                data["is_locked"], data.get("interest_period"),
+                ((trans["type"], trans["amount"],
+                  to_epoch(datetime.strptime(trans["timestamp"], "%Y-%m-%d %H:%M:%S")),
+                  trans["description"])
+                 for trans in data["transaction_log"])
+            )
+    snapshot.write(snapshot_path)
+    return len(snapshot.ids)
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else "bank_data.txt"
+    target = sys.argv[2] if len(sys.argv) > 2 else "bank_data.bin"
+    count = migrate_text_data(source, target)
+    print(f"Migrated {count} accounts from {source} to {target}")
@@ -1,252 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import math
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-import os
-from datetime import datetime
-import csv
-import random
-import hashlib
-
-# Custom Exceptions
-class BankingException(Exception):
-    pass
-
-class InvalidDepositAmountException(BankingException):
-    pass
-
-class InvalidWithdrawalAmountException(BankingException):
-    pass
-
-class InsufficientFundsException(BankingException):
-    pass
-
-class AccountLockedException(BankingException):
-    pass
-
-class InvalidIDException(BankingException):
-    pass
-
-class MinimumInitialDepositException(BankingException):
-    pass
-
-class AccountNotFoundException(BankingException):
-    pass
-
-class InvalidAccountTypeException(BankingException):
-    pass
-
-class InvalidPasswordException(BankingException):
-    pass
-
-class InterestAlreadyAppliedException(BankingException):
-    pass
-
-# Transaction Class
-class Transaction:
-    def __init__(self, trans_type, amount, description):
-        self.trans_type = trans_type
-        self.amount = amount
-        self.timestamp = datetime.now()
-        self.description = description
-
-    def __str__(self):
-        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {self.trans_type} | {self.amount} HUF | {self.description}"
-
-    def to_dict(self):
-        return {
-            "type": self.trans_type,
-            "amount": self.amount,
-            "timestamp": self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            "description": self.description
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        trans = cls(data["type"], data["amount"], data["description"])
-        trans.timestamp = datetime.strptime(data["timestamp"], '%Y-%m-%d %H:%M:%S')
-        return trans
-
-# Savings Account Base Class
-class SavingsAccount:
-    def __init__(self, id_number, name, initial_deposit, account_type, password):
-        if initial_deposit < 1000:
-            raise MinimumInitialDepositException("Initial deposit must be at least 1000 HUF")
-        self.id_number = id_number
-        self.name = name
-        self.balance = initial_deposit
-        self.account_number = random.randint(100000, 999999)
-        self.account_type = account_type
-        self.password_hash = hashlib.sha256(password.encode()).hexdigest()
-        self.transaction_log = [Transaction("Deposit", initial_deposit, "Initial Deposit")]
-        self.failed_withdrawals = 0
-        self.is_locked = False
-
-    def verify_password(self, password):
-        return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
-
-    def deposit(self, amount):
-        if amount <= 0:
-            raise InvalidDepositAmountException("Deposit amount must be positive")
-        self.balance += amount
-        self.transaction_log.append(Transaction("Deposit", amount, "Deposit"))
-        return f"Deposited {amount} HUF"
-
-    def withdraw(self, amount):
-        if self.is_locked:
-            raise AccountLockedException("Account is locked due to multiple failed withdrawals")
-        if amount <= 0:
-            raise InvalidWithdrawalAmountException("Withdrawal amount must be positive")
-        if self.balance - amount < 100:
-            self.failed_withdrawals += 1
-            if self.failed_withdrawals >= 3:
-                self.is_locked = True
-                raise AccountLockedException("Account locked after 3 failed withdrawals")
-            raise InsufficientFundsException("Insufficient funds: Balance cannot go below 100 HUF")
-        self.balance -= amount
-        self.transaction_log.append(Transaction("Withdrawal", -amount, "Withdrawal"))
-        return f"Withdrew {amount} HUF"
-
-    def apply_interest(self):
-        raise NotImplementedError
-
-    def to_dict(self):
-        return {
-            "id_number": self.id_number,
-            "name": self.name,
-            "balance": self.balance,
-            "account_number": self.account_number,
-            "account_type": self.account_type,
-            "password_hash": self.password_hash,
-            "transaction_log": [trans.to_dict() for trans in self.transaction_log],
-            "failed_withdrawals": self.failed_withdrawals,
-            "is_locked": self.is_locked
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        account_class = BasicAccount if data["account_type"] == "Basic" else PremiumAccount
-        account = account_class(
-            data["id_number"],
-            data["name"],
-            data["balance"],
-            data["account_type"],
-            ""  # Password not needed for loading; hash is stored
-        )
-        account.balance = data["balance"]
-        account.account_number = data["account_number"]
-        account.password_hash = data["password_hash"]
-        account.transaction_log = [Transaction.from_dict(trans) for trans in data["transaction_log"]]
-        account.failed_withdrawals = data["failed_withdrawals"]
-        account.is_locked = data["is_locked"]
-        return account
-
-# Basic and Premium Account Subclasses
-class BasicAccount(SavingsAccount):
-    def apply_interest(self):
-        interest = self.balance * 0.02
-        self.balance += interest
-        self.transaction_log.append(Transaction("Interest", interest, "2% Interest Applied"))
-        return f"Applied 2% interest: {interest} HUF"
-
-class PremiumAccount(SavingsAccount):
-    def apply_interest(self):
-        interest = self.balance * 0.04
-        self.balance += interest
-        self.transaction_log.append(Transaction("Interest", interest, "4% Interest Applied"))
-        return f"Applied 4% interest: {interest} HUF"
-
-# Bank System Class
-class BankSystem:
-    def __init__(self):
-        self.accounts = {}
-        self.account_numbers = set()
-        self.load_data()
-
-    def create_account(self, id_number, name, initial_deposit, account_type, password):
-        if id_number in self.accounts:
-            raise InvalidIDException("ID number already exists")
-        if not password:
-            raise InvalidPasswordException("Password cannot be empty")
-        if account_type not in ["Basic", "Premium"]:
-            raise InvalidAccountTypeException("Account type must be Basic or Premium")
-        account_class = BasicAccount if account_type == "Basic" else PremiumAccount
-        account = account_class(id_number, name, initial_deposit, account_type, password)
-        while account.account_number in self.account_numbers:
-            account.account_number = random.randint(100000, 999999)
-        self.accounts[id_number] = account
-        self.account_numbers.add(account.account_number)
-        self.save_data()
-        return account
-
-    def login(self, id_number, password):
-        if id_number not in self.accounts:
-            raise InvalidIDException("ID number not found")
-        account = self.accounts[id_number]
-        if not account.verify_password(password):
-            raise InvalidPasswordException("Incorrect password")
-        return account
-
-    def get_account(self, id_number):
-        if id_number not in self.accounts:
-            raise AccountNotFoundException("Account not found")
-        return self.accounts[id_number]
-
-    def remove_account(self, id_number):
-        if id_number not in self.accounts:
-            raise AccountNotFoundException("Account not found")
-        account = self.accounts[id_number]
-        withdraw_amount = 0
-        if account.balance > 100:
-            withdraw_amount = account.balance - 100
-            account.withdraw(withdraw_amount)
-        self.account_numbers.remove(account.account_number)
-        del self.accounts[id_number]
-        self.save_data()
-        return f"Account {account.account_number} removed, {withdraw_amount} HUF withdrawn"
-
-    def save_data(self):
-        with open("bank_data.txt", "w") as f:
-            for account in self.accounts.values():
-                account_data = account.to_dict()
-                f.write(str(account_data) + "\n")
-
-    def load_data(self):
-        if os.path.exists("bank_data.txt"):
-            with open("bank_data.txt", "r") as f:
-                for line in f:
-                    try:
-                        account_data = eval(line.strip())  # Safely parse the dictionary
-                        account = SavingsAccount.from_dict(account_data)
-                        self.accounts[account.id_number] = account
-                        self.account_numbers.add(account.account_number)
-                    except Exception as e:
-                        print(f"Error loading account data: {e}")
-
-    def export_transactions(self, account):
-        filename = f"transactions_{account.account_number}.csv"
-        with open(filename, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Account Number", "Date/Time", "Action", "Amount", "Description"])
-            for trans in account.transaction_log:
-                writer.writerow([
-                    account.account_number,
-                    trans.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                    trans.trans_type,
-                    trans.amount,
-                    trans.description
-                ])
-        return filename
+from bank_core import (
+    BankingException, InvalidDepositAmountException, InvalidWithdrawalAmountException,
+    InsufficientFundsException, AccountLockedException, InvalidIDException, MinimumInitialDepositException,
+    AccountNotFoundException, InvalidAccountTypeException, InvalidPasswordException,
+    InterestAlreadyAppliedException, InvalidOperationException, InvalidSessionException,
+    AccountNumbersExhaustedException, current_period, Transaction, TransactionLog, SavingsAccount,
+    BasicAccount, PremiumAccount, BankSystem
+)
 
 # Tkinter GUI with ttkbootstrap
+HISTORY_PAGE_SIZE = 200
+HISTORY_CHUNK_SIZE = 50
+
 class BankingApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Banking Simulation")
         self.bank = BankSystem()
         self.current_account = None
-        self.interest_applied = False
         self.setup_gui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        self.bank.close()
+        self.root.destroy()
 
     def setup_gui(self):
         self.root.geometry("900x700")
@@ -315,11 +96,23 @@ class BankingApp:
         self.balance_label = ttk.Label(self.info_frame, text="Balance: N/A", font=("Helvetica", 12, "bold"))
         self.balance_label.grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
 
-        self.trans_list = tk.Text(self.info_frame, height=8, width=80, font=("Helvetica", 10))
+        # Only the most recent page of history is rendered; older pages are
+        # loaded when the view is scrolled to the top
+        self.trans_list = ttk.Treeview(self.info_frame, columns=("time", "action", "amount", "description"), show="headings", height=8)
+        for column, heading, width in (("time", "Date/Time", 150), ("action", "Action", 100), ("amount", "Amount", 120), ("description", "Description", 250)):
+            self.trans_list.heading(column, text=heading)
+            self.trans_list.column(column, width=width, anchor=tk.W)
         self.trans_list.grid(row=1, column=0, padx=5, pady=2, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar = ttk.Scrollbar(self.info_frame, orient=tk.VERTICAL, command=self.trans_list.yview, bootstyle="primary")
-        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
-        self.trans_list.config(yscrollcommand=scrollbar.set)
+        self.trans_scrollbar = ttk.Scrollbar(self.info_frame, orient=tk.VERTICAL, command=self.trans_list.yview, bootstyle="primary")
+        self.trans_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.trans_list.config(yscrollcommand=self.on_history_scroll)
+        self.shown_account = None
+        self.shown_from = 0
+        self.shown_to = 0
+        self.render_job = None
+        self.loading_older = False
+        self.older_target = 0
+        self.older_anchor = None
 
         # Status Bar
         self.status_var = tk.StringVar(value="Ready")
@@ -333,8 +126,7 @@ class BankingApp:
             if not id_number or not password:
                 raise InvalidIDException("ID number and password cannot be empty")
             self.current_account = self.bank.login(id_number, password)
-            self.interest_applied = False
-            self.interest_button.config(state="normal")
+            self.update_interest_button()
             self.update_account_info()
             self.status_var.set(f"Logged in as {self.current_account.name}")
             messagebox.showinfo("Success", f"Logged in as {self.current_account.name}")
@@ -349,10 +141,11 @@ class BankingApp:
             if not id_number or not name or not password:
                 raise InvalidIDException("ID number, name, and password cannot be empty")
             deposit = float(self.deposit_entry.get())
+            if not math.isfinite(deposit):
+                raise ValueError(deposit)
             account_type = self.account_type.get()
             self.current_account = self.bank.create_account(id_number, name, deposit, account_type, password)
-            self.interest_applied = False
-            self.interest_button.config(state="normal")
+            self.update_interest_button()
             self.update_account_info()
             self.status_var.set(f"Account created for {name}")
             messagebox.showinfo("Success", "Account created successfully")
@@ -367,8 +160,9 @@ class BankingApp:
             return
         try:
             amount = float(self.amount_entry.get())
-            message = self.current_account.deposit(amount)
-            self.bank.save_data()
+            if not math.isfinite(amount):
+                raise ValueError(amount)
+            message = self.bank.deposit(self.current_account, amount)
             self.update_account_info()
             self.status_var.set(message)
             messagebox.showinfo("Success", message)
@@ -383,8 +177,9 @@ class BankingApp:
             return
         try:
             amount = float(self.amount_entry.get())
-            message = self.current_account.withdraw(amount)
-            self.bank.save_data()
+            if not math.isfinite(amount):
+                raise ValueError(amount)
+            message = self.bank.withdraw(self.current_account, amount)
             self.update_account_info()
             self.status_var.set(message)
             messagebox.showinfo("Success", message)
@@ -398,12 +193,8 @@ class BankingApp:
             messagebox.showerror("Error", "Please log in to an account")
             return
         try:
-            if self.interest_applied:
-                raise InterestAlreadyAppliedException("Interest can only be applied once per login session")
-            message = self.current_account.apply_interest()
-            self.interest_applied = True
-            self.interest_button.config(state="disabled")
-            self.bank.save_data()
+            message = self.bank.apply_interest(self.current_account)
+            self.update_interest_button()
             self.update_account_info()
             self.status_var.set(message)
             messagebox.showinfo("Success", message)
@@ -430,10 +221,8 @@ class BankingApp:
             if confirm:
                 message = self.bank.remove_account(self.current_account.id_number)
                 self.current_account = None
-                self.interest_applied = False
-                self.interest_button.config(state="normal")
+                self.update_interest_button()
                 self.update_account_info()
-                self.bank.save_data()
                 self.status_var.set(message)
                 self.id_entry.delete(0, tk.END)
                 self.password_entry.delete(0, tk.END)
@@ -446,8 +235,7 @@ class BankingApp:
 
     def logout(self):
         self.current_account = None
-        self.interest_applied = False
-        self.interest_button.config(state="normal")
+        self.update_interest_button()
         self.update_account_info()
         self.status_var.set("Logged out")
         self.id_entry.delete(0, tk.END)
@@ -457,15 +245,74 @@ class BankingApp:
         self.amount_entry.delete(0, tk.END)
         messagebox.showinfo("Success", "Logged out successfully")
 
+    def update_interest_button(self):
+        # Interest is applied once per period, so the button stays disabled across logins
+        if self.current_account and self.current_account.interest_period == current_period():
+            self.interest_button.config(state="disabled")
+        else:
+            self.interest_button.config(state="normal")
+
     def update_account_info(self):
         if self.current_account:
             self.balance_label.config(text=f"Balance: {self.current_account.balance:.2f} HUF")
-            self.trans_list.delete(1.0, tk.END)
-            for trans in self.current_account.transaction_log:
-                self.trans_list.insert(tk.END, str(trans) + "\n")
+            if self.current_account is not self.shown_account:
+                self.clear_history()
+                self.shown_account = self.current_account
+                self.shown_from = self.shown_to = max(0, len(self.current_account.transaction_log) - HISTORY_PAGE_SIZE)
+            # Rows already on screen are kept; only new transactions are appended
+            self.schedule_render()
         else:
             self.balance_label.config(text="Balance: N/A")
-            self.trans_list.delete(1.0, tk.END)
+            self.clear_history()
+
+    def clear_history(self):
+        if self.render_job:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+        self.trans_list.delete(*self.trans_list.get_children())
+        self.shown_account = None
+        self.shown_from = self.shown_to = 0
+        self.loading_older = False
+
+    def history_row(self, trans):
+        return (trans.timestamp.strftime("%Y-%m-%d %H:%M:%S"), trans.trans_type, f"{trans.amount} HUF", trans.description)
+
+    def schedule_render(self):
+        if not self.render_job:
+            self.render_job = self.root.after_idle(self.render_history)
+
+    def render_history(self):
+        # Formats and inserts at most HISTORY_CHUNK_SIZE rows per Tk callback so
+        # the event loop keeps handling input while a long history loads
+        self.render_job = None
+        log = self.shown_account.transaction_log
+        if self.loading_older:
+            start = max(self.older_target, self.shown_from - HISTORY_CHUNK_SIZE)
+            for position, trans in enumerate(log[start:self.shown_from]):
+                self.trans_list.insert("", position, values=self.history_row(trans))
+            self.shown_from = start
+            self.loading_older = self.shown_from > self.older_target
+            if not self.loading_older:
+                # Keep the row the user scrolled up to in view instead of jumping to the new top
+                self.trans_list.see(self.older_anchor)
+        else:
+            end = min(len(log), self.shown_to + HISTORY_CHUNK_SIZE)
+            for trans in log[self.shown_to:end]:
+                self.trans_list.insert("", tk.END, values=self.history_row(trans))
+            if end > self.shown_to:
+                self.trans_list.yview_moveto(1.0)
+            self.shown_to = end
+        if self.loading_older or self.shown_to < len(log):
+            self.render_job = self.root.after(1, self.render_history)
+
+    def on_history_scroll(self, first, last):
+        self.trans_scrollbar.set(first, last)
+        if float(first) == 0.0 and self.shown_account and self.shown_from > 0 and not self.loading_older \
+                and self.shown_to >= len(self.shown_account.transaction_log):
+            self.loading_older = True
+            self.older_target = max(0, self.shown_from - HISTORY_PAGE_SIZE)
+            self.older_anchor = self.trans_list.get_children()[0]
+            self.schedule_render()
 
 if __name__ == "__main__":
     root = ttk.Window(themename="darkly")
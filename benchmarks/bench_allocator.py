@@ -0,0 +1,45 @@
+# Account number benchmark: cost per allocation as the book fills, for the
+# original random draw with retries versus the permuted-sequence allocator
+#   python -m benchmarks.bench_allocator --digits 6 --fill 0.99
+import argparse
+import random
+import time
+
+from bank_numbers import AccountNumberAllocator
+
+def legacy_allocate(taken, low, high):
+    number = random.randint(low, high)
+    while number in taken:
+        number = random.randint(low, high)
+    return number
+
+def fill(allocate, total, steps):
+    # Returns the mean microseconds per allocation within each step of the fill
+    taken = set()
+    timings = []
+    per_step = total // steps
+    for _ in range(steps):
+        start = time.perf_counter()
+        for _ in range(per_step):
+            taken.add(allocate(taken))
+        timings.append((time.perf_counter() - start) / per_step * 1e6)
+    assert len(taken) == per_step * steps
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare account number allocation cost from an empty to a full book")
+    parser.add_argument("--digits", type=int, default=6)
+    parser.add_argument("--fill", type=float, default=0.99, help="final share of the number space in use")
+    parser.add_argument("--steps", type=int, default=11)
+    args = parser.parse_args()
+    low = 10 ** (args.digits - 1)
+    high = 10 * low - 1
+    total = int((high - low + 1) * args.fill)
+    allocator = AccountNumberAllocator(args.digits)
+    legacy = fill(lambda taken: legacy_allocate(taken, low, high), total, args.steps)
+    permuted = fill(allocator.allocate, total, args.steps)
+    print(f"{total} allocations in a {high - low + 1} number space (mean us per allocation)")
+    print("  book full    random+retry    allocator")
+    per_step = total // args.steps
+    for step, (before, after) in enumerate(zip(legacy, permuted), 1):
+        print(f"  {per_step * step / (high - low + 1):8.1%}  {before:13.2f}  {after:11.2f}")
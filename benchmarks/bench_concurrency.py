@@ -0,0 +1,82 @@
+# Concurrency stress test and throughput-vs-threads benchmark. Random deposits
+# and withdrawals hammer a small set of accounts from a thread pool; afterwards
+# the total balance and every failed_withdrawals counter must match what the
+# workers observed, both in memory and after replaying the journal.
+#   python -m benchmarks.bench_concurrency --threads 1,2,4,8,16 --ops 20000
+import argparse
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException, AccountLockedException, InsufficientFundsException
+
+INITIAL_BALANCE = 5000.0
+
+def worker(bank, ids, ops, seed):
+    rng = random.Random(seed)
+    net = 0.0
+    failures = Counter()
+    for _ in range(ops):
+        account = bank.get_account(rng.choice(ids))
+        amount = float(rng.randint(1, 400))
+        if rng.random() < 0.5:
+            bank.deposit(account, amount)
+            net += amount
+            continue
+        try:
+            bank.withdraw(account, amount)
+            net -= amount
+        except InsufficientFundsException:
+            failures[account.id_number] += 1
+        except AccountLockedException as e:
+            # Only the withdrawal that locks the account increments the counter
+            if "after 3" in str(e):
+                failures[account.id_number] += 1
+        except BankingException:
+            pass
+    return net, failures
+
+def check(bank, ids, net, failures):
+    total = sum(bank.get_account(id_number).balance for id_number in ids)
+    assert total == len(ids) * INITIAL_BALANCE + net, f"balance drift: {total} != {len(ids) * INITIAL_BALANCE + net}"
+    for id_number in ids:
+        observed = bank.get_account(id_number).failed_withdrawals
+        assert observed == failures[id_number], f"account {id_number}: {observed} != {failures[id_number]}"
+
+def run(threads, accounts, ops, sync_policy):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, sync_policy=sync_policy, background=True, compact_every=ops // 2,
+                          password_hasher=PasswordHasher(iterations=1000))
+        ids = [str(i) for i in range(accounts)]
+        for id_number in ids:
+            bank.create_account(id_number, f"Customer {id_number}", INITIAL_BALANCE, "Basic", "secret")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(lambda seed: worker(bank, ids, ops // threads, seed), range(threads)))
+        elapsed = time.perf_counter() - start
+        net = sum(result[0] for result in results)
+        failures = sum((result[1] for result in results), Counter())
+        # Non-finite amounts are rejected without touching any balance
+        bad_rows = [{"id_number": ids[0], "operation": operation, "amount": amount}
+                    for operation in ("deposit", "withdraw") for amount in ("nan", "inf", "-inf")]
+        applied, rejections = bank.post_batch(bad_rows)
+        assert applied == 0 and len(rejections) == len(bad_rows), f"non-finite rows posted: {rejections}"
+        check(bank, ids, net, failures)
+        bank.close()
+        reopened = BankSystem(data_dir)
+        check(reopened, ids, net, failures)
+        reopened.close()
+    print(f"{threads:>3} threads  {ops / elapsed:>10,.0f} ops/s  (balances and failure counters conserved)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress concurrent deposits and withdrawals")
+    parser.add_argument("--threads", default="1,2,4,8,16")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=20000, help="operations per run")
+    parser.add_argument("--sync-policy", default="always", choices=["always", "group", "interval"])
+    args = parser.parse_args()
+    for threads in args.threads.split(","):
+        run(int(threads), args.accounts, args.ops, args.sync_policy)
@@ -0,0 +1,78 @@
+# GUI benchmark: time to refresh the account view after one deposit, for the
+# original full Text redraw versus the paged Treeview history
+#   python -m benchmarks.bench_gui --sizes 1000,10000,100000
+# Needs a display (or Xvfb); the window is kept withdrawn.
+import argparse
+import tempfile
+import time
+import tkinter as tk
+
+import ttkbootstrap as ttk
+
+from bankingSimulation import BankSystem, BankingApp, SavingsAccount, Transaction, TransactionLog
+
+def populate(bank, size):
+    account = SavingsAccount.restore(
+        "1", "Bench", "0" * 64, 1000.0, 100001, "Basic", 0, False, None,
+        TransactionLog(Transaction("Deposit", float(i % 500), "Deposit") for i in range(size))
+    )
+    bank.accounts[account.id_number] = account
+    bank.account_numbers.add(account.account_number)
+    return account
+
+def drain(app):
+    # Runs Tk callbacks until the history has finished rendering
+    app.root.update()
+    while app.render_job:
+        app.root.update()
+
+def legacy_refresh(text, account):
+    text.delete(1.0, tk.END)
+    for trans in account.transaction_log:
+        text.insert(tk.END, str(trans) + "\n")
+    text.update_idletasks()
+
+def run(root, size):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir)
+        account = populate(bank, size)
+        text = tk.Text(root)
+        start = time.perf_counter()
+        legacy_refresh(text, account)
+        legacy = time.perf_counter() - start
+        text.destroy()
+
+        window = ttk.Toplevel(root)
+        window.withdraw()
+        app = BankingApp.__new__(BankingApp)
+        app.root = window
+        app.bank = bank
+        app.current_account = None
+        app.setup_gui()
+        app.current_account = account
+        start = time.perf_counter()
+        app.update_account_info()
+        drain(app)
+        first = time.perf_counter() - start
+        bank.deposit(account, 500)
+        start = time.perf_counter()
+        app.update_account_info()
+        drain(app)
+        append = time.perf_counter() - start
+        window.destroy()
+        bank.close()
+    return legacy, first, append
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare account view refresh time against history length")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+    root = ttk.Window(themename="darkly")
+    root.withdraw()
+    for size in map(int, args.sizes.split(",")):
+        legacy, first, append = run(root, size)
+        print(f"{size} transactions")
+        print(f"  full Text redraw    : {legacy * 1000:9.1f} ms")
+        print(f"  paged view, first   : {first * 1000:9.1f} ms")
+        print(f"  paged view, append  : {append * 1000:9.1f} ms ({legacy / append:.0f}x faster)")
+    root.destroy()
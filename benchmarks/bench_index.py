@@ -0,0 +1,75 @@
+# Query benchmark: secondary-index lookups versus a scan over every account
+#   python -m benchmarks.bench_index --accounts 1000000
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bank_core import BankSystem, SavingsAccount, TransactionLog, Transaction
+from bank_snapshot import to_epoch
+
+def populate(bank, count, transactions):
+    start = to_epoch(datetime(2024, 1, 1))
+    for i in range(count):
+        log = TransactionLog([Transaction.restore("Deposit", 100.0, start + (i + j * count) * 60, "Deposit")
+                              for j in range(transactions)])
+        account = SavingsAccount.restore(
+            str(i), f"Customer {i % 50000}", "0" * 64, float(1000 + i % 100000), 100000 + i,
+            "Basic" if i % 3 else "Premium", 3 if i % 97 == 0 else 0, i % 97 == 0, None, log
+        )
+        bank.accounts[account.id_number] = account
+        bank.account_numbers.add(account.account_number)
+    bank.index.rebuild(bank.accounts.values())
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+def run(count, transactions):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, compact_every=10 ** 9)
+        populate(bank, count, transactions)
+        accounts = bank.accounts.values()
+        number = 100000 + count // 2
+        window_start = datetime(2024, 1, 1) + timedelta(minutes=count // 2)
+        window_end = window_start + timedelta(minutes=100)
+        start_epoch, end_epoch = to_epoch(window_start), to_epoch(window_end)
+        queries = [
+            ("account number", lambda: bank.find_accounts(account_number=number),
+             lambda: [a for a in accounts if a.account_number == number]),
+            ("name", lambda: bank.find_accounts(name="Customer 42"),
+             lambda: [a for a in accounts if a.name == "Customer 42"]),
+            ("balance range", lambda: bank.find_accounts(min_balance=5000, max_balance=5100),
+             lambda: [a for a in accounts if 5000 <= a.balance < 5100]),
+            ("locked", lambda: bank.find_accounts(locked=True),
+             lambda: [a for a in accounts if a.is_locked]),
+            ("transactions in window", lambda: list(bank.transactions_between(window_start, window_end)),
+             lambda: [(a, t) for a in accounts for t in a.transaction_log if start_epoch <= t.epoch < end_epoch]),
+        ]
+        print(f"{count} accounts, {count * transactions} transactions")
+        # The per-day activity index is built by the first time-window query
+        first_seconds, _ = timed(lambda: list(bank.transactions_between(window_start, window_end)), 1)
+        print(f"  first window query (builds activity index): {first_seconds * 1000:.1f} ms")
+        for label, indexed, scan in queries:
+            indexed_seconds, indexed_result = timed(indexed, 5)
+            scan_seconds, scan_result = timed(scan, 1)
+            assert len(indexed_result) == len(scan_result)
+            print(f"  {label:22}: index {indexed_seconds * 1000:9.3f} ms, scan {scan_seconds * 1000:9.1f} ms "
+                  f"({scan_seconds / indexed_seconds:.0f}x, {len(indexed_result)} rows)")
+        account = bank.get_account("1")
+        updates = 10000
+        start = time.perf_counter()
+        for _ in range(updates):
+            account.balance += 1
+            bank.index.update(account)
+        print(f"  index upkeep per mutation: {(time.perf_counter() - start) / updates * 1e6:.1f} us")
+        bank.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare indexed account and transaction queries with full scans")
+    parser.add_argument("--accounts", type=int, default=1000000)
+    parser.add_argument("--transactions", type=int, default=3, help="transactions per account")
+    args = parser.parse_args()
+    run(args.accounts, args.transactions)
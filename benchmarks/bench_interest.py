@@ -0,0 +1,51 @@
+# Interest benchmark: month-end batch run versus one apply_interest per account
+#   python -m benchmarks.bench_interest --accounts 1000000
+import argparse
+import tempfile
+import time
+
+from bank_core import BankSystem, SavingsAccount, TransactionLog, Transaction
+
+def populate(bank, count):
+    for i in range(count):
+        account = SavingsAccount.restore(
+            str(i), f"Customer {i}", "0" * 64, float(1000 + i % 100000), 100000 + i,
+            "Basic" if i % 3 else "Premium", 0, False, None,
+            TransactionLog([Transaction("Deposit", float(1000 + i % 100000), "Initial Deposit")])
+        )
+        bank.accounts[account.id_number] = account
+        bank.account_numbers.add(account.account_number)
+    # Accounts placed directly need their index entries, as every operation updates them
+    bank.index.rebuild(bank.accounts.values())
+
+def run(count, baseline_count):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, compact_every=10 ** 9)
+        populate(bank, count)
+        start = time.perf_counter()
+        applied, total = bank.apply_interest_batch("2024-01")
+        batch_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        bank.apply_interest_batch("2024-01")
+        rerun_seconds = time.perf_counter() - start
+        bank.close()
+    print(f"batch    : {applied} accounts in {batch_seconds:.2f}s "
+          f"({applied / batch_seconds:,.0f} accounts/s), {total:,.2f} HUF credited")
+    print(f"re-run   : {rerun_seconds:.3f}s (period already applied, nothing credited)")
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, compact_every=10 ** 9)
+        populate(bank, baseline_count)
+        start = time.perf_counter()
+        for account in list(bank.accounts.values()):
+            bank.apply_interest(account, "2024-01")
+        single_seconds = time.perf_counter() - start
+        bank.close()
+    print(f"per-account: {baseline_count} accounts in {single_seconds:.2f}s "
+          f"({baseline_count / single_seconds:,.0f} accounts/s, one fsynced journal write each)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure month-end interest throughput")
+    parser.add_argument("--accounts", type=int, default=1000000)
+    parser.add_argument("--baseline-accounts", type=int, default=10000)
+    args = parser.parse_args()
+    run(args.accounts, args.baseline_accounts)
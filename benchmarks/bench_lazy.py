@@ -0,0 +1,65 @@
+# Headless import and time-to-first-operation benchmark: importing the core
+# versus the GUI module (each in a fresh interpreter), then opening a book
+# eagerly versus with BankSystem(lazy=True) and serving one login + deposit.
+#   python -m benchmarks.bench_lazy --sizes 10000,100000,500000
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bank_auth import PasswordHasher
+from bank_core import BankSystem
+from benchmarks.workload import generate, password_for
+
+IMPORT_TIMER = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+def import_seconds(module, runs):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", IMPORT_TIMER.format(module=module)],
+                                capture_output=True, text=True)
+        if result.returncode:
+            return None
+        samples.append(float(result.stdout))
+    return statistics.median(samples)
+
+def first_op(data_dir, lazy, hasher):
+    # Seconds to open the store, then to answer the first request
+    start = time.perf_counter()
+    bank = BankSystem(data_dir, password_hasher=hasher, lazy=lazy)
+    opened = time.perf_counter()
+    account = bank.login("1", password_for("1"))
+    bank.deposit(account, 100.0)
+    done = time.perf_counter()
+    bank.close()
+    return opened - start, done - start
+
+def run(size, transactions, repeat):
+    hasher = PasswordHasher(iterations=1000)
+    with tempfile.TemporaryDirectory() as data_dir:
+        generate(os.path.join(data_dir, "bank_data.txt"), size, transactions_per_account=transactions)
+        BankSystem(data_dir).close()
+        for lazy in (False, True):
+            timings = [first_op(data_dir, lazy, hasher) for _ in range(repeat)]
+            opened = statistics.median(timing[0] for timing in timings)
+            done = statistics.median(timing[1] for timing in timings)
+            print(f"  {size:>9} accounts  {'lazy ' if lazy else 'eager'}  open {opened * 1e3:10.1f} ms  "
+                  f"first op done {done * 1e3:10.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and time to the first operation")
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    parser.add_argument("--transactions", type=int, default=10, help="mean transactions per account")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--import-runs", type=int, default=5)
+    args = parser.parse_args()
+    print(f"Import time (median of {args.import_runs} fresh interpreters)")
+    for module in ("bank_core", "bankingSimulation"):
+        seconds = import_seconds(module, args.import_runs)
+        print(f"  {module:18} " + (f"{seconds * 1e3:8.1f} ms" if seconds is not None else "   not importable here"))
+    print("Time to first operation (login + deposit)")
+    for size in args.sizes.split(","):
+        run(int(size), args.transactions, args.repeat)
@@ -0,0 +1,46 @@
+# Memory benchmark: bytes per transaction for the original plain-object
+# Transaction versus the compact __slots__ representation
+#   python -m benchmarks.bench_memory --transactions 1000000
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+
+from bank_core import Transaction
+
+class LegacyTransaction:
+    def __init__(self, trans_type, amount, description):
+        self.trans_type = trans_type
+        self.amount = amount
+        self.timestamp = datetime.now()
+        self.description = description
+
+def measure(factory, count):
+    gc.collect()
+    tracemalloc.start()
+    transactions = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del transactions
+    return size / count
+
+def legacy(i):
+    # Descriptions built at runtime (as read back from disk) are not shared
+    if i % 3 == 0:
+        return LegacyTransaction("Interest", i * 0.02, "".join(("2% Interest", " Applied")))
+    return LegacyTransaction("Deposit", float(i % 500), "".join(("Dep", "osit")))
+
+def compact(i):
+    if i % 3 == 0:
+        return Transaction("Interest", i * 0.02, "".join(("2% Interest", " Applied")))
+    return Transaction("Deposit", float(i % 500), "".join(("Dep", "osit")))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare bytes per transaction")
+    parser.add_argument("--transactions", type=int, default=1000000)
+    args = parser.parse_args()
+    before = measure(legacy, args.transactions)
+    after = measure(compact, args.transactions)
+    print(f"{args.transactions} transactions")
+    print(f"  plain object : {before:7.1f} bytes/transaction")
+    print(f"  __slots__    : {after:7.1f} bytes/transaction ({before / after:.1f}x smaller)")
@@ -0,0 +1,76 @@
+# Instrumentation overhead: deposit/withdraw throughput with metrics disabled
+# and enabled, alternating the order each round so drift affects both alike. The journal is
+# fsynced on an interval so CPU cost, not the disk, dominates.
+#   python -m benchmarks.bench_metrics --ops 50000 --prometheus bank.prom --profile bank.folded
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import bank_metrics
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException
+
+def workload(bank, accounts, ops):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(ops):
+        account = accounts[rng.randrange(len(accounts))]
+        try:
+            if rng.random() < 0.5:
+                bank.deposit(account, float(rng.randint(1, 400)))
+            else:
+                bank.withdraw(account, float(rng.randint(1, 400)))
+        except BankingException:
+            pass
+    return ops / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure instrumentation overhead")
+    parser.add_argument("--ops", type=int, default=50000, help="operations per round")
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--prometheus", help="write the collected metrics in Prometheus text format")
+    parser.add_argument("--json", help="write the collected metrics as JSON")
+    parser.add_argument("--profile", help="write sampled stacks of the instrumented run in collapsed format")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, sync_policy="interval", compact_every=10 ** 9,
+                          password_hasher=PasswordHasher(iterations=1000))
+        accounts = [bank.create_account(str(i), f"Customer {i}", 1000000.0, "Basic", "secret") for i in range(100)]
+        metrics = bank_metrics.Metrics()
+        disabled = []
+        enabled = []
+        for round_number in range(args.rounds):
+            # Alternate which mode goes first, as the growing history slows later runs
+            for instrumented in ((False, True) if round_number % 2 == 0 else (True, False)):
+                if instrumented:
+                    bank_metrics.enable(metrics)
+                    enabled.append(workload(bank, accounts, args.ops))
+                    bank_metrics.disable()
+                else:
+                    disabled.append(workload(bank, accounts, args.ops))
+        if args.profile:
+            bank_metrics.enable(metrics)
+            with bank_metrics.Profiler(args.profile):
+                profiled = workload(bank, accounts, args.ops)
+            bank.save_data()
+            bank_metrics.disable()
+        bank.close()
+    disabled = statistics.median(disabled)
+    enabled = statistics.median(enabled)
+    print(f"{args.ops} operations per round, median of {args.rounds}")
+    print(f"  disabled : {disabled:>10,.0f} ops/s")
+    print(f"  enabled  : {enabled:>10,.0f} ops/s ({(disabled - enabled) / disabled:+.1%} overhead)")
+    if args.profile:
+        print(f"  profiled : {profiled:>10,.0f} ops/s (stacks in {args.profile})")
+    for name in ("BankSystem.deposit", "BankSystem.withdraw", "Journal.sync", "Snapshot.write"):
+        histogram = metrics.operations[name]
+        if not histogram.count:
+            continue
+        print(f"  {name:20} count {histogram.count:>8}  p50 <= {histogram.quantile(0.5) * 1e6:8.0f} us  "
+              f"p99 <= {histogram.quantile(0.99) * 1e6:8.0f} us")
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+    if args.json:
+        metrics.write_json(args.json)
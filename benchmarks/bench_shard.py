@@ -0,0 +1,113 @@
+# Sharding scale-out: deposit/withdraw throughput of an in-process BankSystem
+# and of ShardedBank with 1, 2, 4 and 8 shard processes, posting rows in
+# batches (post_batch) and from concurrent client threads, one operation per
+# call. Speedups are relative to one shard, so they show how the router scales
+# with cores rather than the cost of the pipe hop; expect no gain beyond the
+# machine's core count. Random transfers, most of them between shards, are
+# timed last and must leave the total balance unchanged.
+#   python -m benchmarks.bench_shard --accounts 10000 --ops 100000 --shards 1,2,4,8
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException
+from bank_shard import ShardedBank
+
+def operations(accounts, ops, seed=0):
+    rng = random.Random(seed)
+    return [{"id_number": str(rng.randrange(accounts)),
+             "operation": "deposit" if rng.random() < 0.5 else "withdraw",
+             "amount": float(rng.randint(1, 400))} for _ in range(ops)]
+
+def single_ops(bank, rows, threads, sharded):
+    def post(share):
+        for row in share:
+            try:
+                if sharded:
+                    getattr(bank, row["operation"])(row["id_number"], row["amount"])
+                else:
+                    getattr(bank, row["operation"])(bank.get_account(row["id_number"]), row["amount"])
+            except BankingException:
+                pass
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(post, [rows[i::threads] for i in range(threads)]))
+    return len(rows) / (time.perf_counter() - start)
+
+def total_balance(bank, sharded):
+    if sharded:
+        return round(sum(account["balance"] for account in bank.find_accounts()), 2)
+    return round(sum(account.balance for account in bank.accounts.values()), 2)
+
+def transfer_ops(bank, accounts, count, threads, sharded, seed=1):
+    rng = random.Random(seed)
+    pairs = [(str(rng.randrange(accounts)), str(rng.randrange(accounts))) for _ in range(count)]
+    before = total_balance(bank, sharded)
+
+    def post(share):
+        for source, target in share:
+            try:
+                if sharded:
+                    bank.transfer(source, target, 1.0)
+                else:
+                    bank.transfer(bank.get_account(source), bank.get_account(target), 1.0)
+            except BankingException:
+                pass
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(post, [pairs[i::threads] for i in range(threads)]))
+    rate = count / (time.perf_counter() - start)
+    assert total_balance(bank, sharded) == before, "transfers changed the total balance"
+    return rate
+
+def batched_ops(bank, rows, batch_size):
+    start = time.perf_counter()
+    bank.post_batch(rows, batch_size)
+    return len(rows) / (time.perf_counter() - start)
+
+def run(shards, args, rows, hasher):
+    with tempfile.TemporaryDirectory() as data_dir:
+        if shards:
+            bank = ShardedBank(data_dir, shards, sync_policy=args.sync_policy, password_hasher=hasher)
+        else:
+            bank = BankSystem(data_dir, sync_policy=args.sync_policy, password_hasher=hasher)
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(lambda i: bank.create_account(str(i), f"Customer {i}", 1000000.0, "Basic", "secret"),
+                          range(args.accounts)))
+        batched = batched_ops(bank, rows, args.batch_size)
+        single = single_ops(bank, rows[:args.single_ops], args.threads, bool(shards))
+        transfers = transfer_ops(bank, args.accounts, args.transfers, args.threads, bool(shards))
+        bank.close()
+    return batched, single, transfers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput as shards are added")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=100000, help="rows posted with post_batch")
+    parser.add_argument("--single-ops", type=int, default=20000, help="rows posted one call at a time")
+    parser.add_argument("--threads", type=int, default=32, help="client threads for single operations")
+    parser.add_argument("--transfers", type=int, default=5000, help="random transfers, one call at a time")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--sync-policy", default="always", choices=["always", "group", "interval"])
+    args = parser.parse_args()
+    hasher = PasswordHasher(iterations=1000)
+    rows = operations(args.accounts, args.ops)
+    print(f"{os.cpu_count()} CPUs, {args.accounts} accounts, sync policy {args.sync_policy}")
+    print(f"  {'':12} {'post_batch ops/s':>18} {'speedup':>8} {'single ops/s':>14} {'speedup':>8} "
+          f"{'transfers/s':>12}")
+    batched, single, transfers = run(0, args, rows, hasher)
+    print(f"  {'in-process':12} {batched:>18,.0f} {'':>8} {single:>14,.0f} {'':>8} {transfers:>12,.0f}")
+    base = None
+    for shards in map(int, args.shards.split(",")):
+        batched, single, transfers = run(shards, args, rows, hasher)
+        base = base or (batched, single)
+        print(f"  {f'{shards} shards':12} {batched:>18,.0f} {batched / base[0]:>7.2f}x "
+              f"{single:>14,.0f} {single / base[1]:>7.2f}x {transfers:>12,.0f}")
+    print("Total balance unchanged by the transfers")
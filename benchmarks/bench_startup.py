@@ -0,0 +1,68 @@
+# Startup benchmark: legacy eval()-per-line bank_data.txt versus the binary snapshot
+#   python -m benchmarks.bench_startup --sizes 10000,100000,1000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bank_core import BankSystem, SavingsAccount
+from bank_snapshot import migrate_text_data
+
+def write_legacy_data(path, accounts, transactions_per_account, seed=42):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(accounts):
+            balance = float(rng.randint(1000, 100000))
+            log = [{"type": "Deposit", "amount": balance, "timestamp": "2024-01-01 09:00:00", "description": "Initial Deposit"}]
+            for j in range(transactions_per_account - 1):
+                amount = float(rng.randint(1, 500))
+                log.append({"type": "Deposit", "amount": amount, "timestamp": f"2024-01-{j % 28 + 1:02d} 10:00:00", "description": "Deposit"})
+            f.write(str({
+                "id_number": str(i),
+                "name": f"Customer {i}",
+                "balance": balance,
+                "account_number": 100000 + i,
+                "account_type": "Basic" if i % 3 else "Premium",
+                "password_hash": "0" * 64,
+                "transaction_log": log,
+                "failed_withdrawals": 0,
+                "is_locked": False
+            }) + "\n")
+
+def load_legacy(path):
+    # The pre-snapshot load_data loop
+    accounts = {}
+    with open(path, "r") as f:
+        for line in f:
+            account = SavingsAccount.from_dict(eval(line.strip()))
+            accounts[account.id_number] = account
+    return accounts
+
+def run(size, transactions_per_account):
+    with tempfile.TemporaryDirectory() as data_dir:
+        text_path = os.path.join(data_dir, "bank_data.txt")
+        write_legacy_data(text_path, size, transactions_per_account)
+        start = time.perf_counter()
+        load_legacy(text_path)
+        legacy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        migrate_text_data(text_path, os.path.join(data_dir, "bank_data.bin"))
+        migrate_seconds = time.perf_counter() - start
+        os.remove(text_path)
+        start = time.perf_counter()
+        bank = BankSystem(data_dir)
+        snapshot_seconds = time.perf_counter() - start
+        bank.close()
+        binary_size = os.path.getsize(os.path.join(data_dir, "bank_data.bin"))
+    print(f"{size:>9} accounts  legacy {legacy_seconds:8.2f}s  snapshot {snapshot_seconds:8.2f}s  "
+          f"speedup {legacy_seconds / snapshot_seconds:5.1f}x  migrate {migrate_seconds:8.2f}s  "
+          f"snapshot size {binary_size / 1e6:8.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare startup time of the text and binary formats")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--transactions", type=int, default=5, help="transactions per account")
+    args = parser.parse_args()
+    for size in args.sizes.split(","):
+        run(int(size), args.transactions)
@@ -0,0 +1,101 @@
+# Transfer benchmark and stress test. Threads move money between random pairs
+# of accounts (crossing directions to provoke lock-order deadlocks); the total
+# must be conserved and every balance must survive a journal replay. Then
+# transfers/sec for a withdraw+deposit pair with one fsync per leg versus
+# transfer rows posted with one group commit per batch.
+#   python -m benchmarks.bench_transfer --threads 1,4,16 --batch-sizes 1,10,100,1000
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException
+
+INITIAL_BALANCE = 5000.0
+
+def create_accounts(bank, accounts):
+    ids = [str(i) for i in range(accounts)]
+    for id_number in ids:
+        bank.create_account(id_number, f"Customer {id_number}", INITIAL_BALANCE, "Basic", "secret")
+    return ids
+
+def worker(bank, ids, ops, seed):
+    rng = random.Random(seed)
+    applied = 0
+    for _ in range(ops):
+        source, target = rng.sample(ids, 2)
+        try:
+            bank.transfer(bank.get_account(source), bank.get_account(target), float(rng.randint(1, 400)))
+            applied += 1
+        except BankingException:
+            pass
+    return applied
+
+def stress(threads, accounts, ops):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, background=True, compact_every=ops // 2,
+                          password_hasher=PasswordHasher(iterations=1000))
+        ids = create_accounts(bank, accounts)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            applied = sum(pool.map(lambda seed: worker(bank, ids, ops // threads, seed), range(threads)))
+        elapsed = time.perf_counter() - start
+        balances = {id_number: bank.get_account(id_number).balance for id_number in ids}
+        assert round(sum(balances.values()), 2) == accounts * INITIAL_BALANCE, "money was created or lost"
+        bank.close()
+        reopened = BankSystem(data_dir)
+        assert {id_number: reopened.get_account(id_number).balance for id_number in ids} == balances
+        reopened.close()
+    print(f"  {threads:>3} threads  {applied / elapsed:>10,.0f} transfers/s  (total conserved, {applied} applied)")
+
+def paired(accounts, ops):
+    # The pre-transfer way: a withdraw and a deposit, each durable on its own
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, password_hasher=PasswordHasher(iterations=1000))
+        ids = create_accounts(bank, accounts)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for _ in range(ops):
+            source, target = rng.sample(ids, 2)
+            amount = float(rng.randint(1, 400))
+            try:
+                bank.withdraw(bank.get_account(source), amount)
+                bank.deposit(bank.get_account(target), amount)
+            except BankingException:
+                pass
+        elapsed = time.perf_counter() - start
+        bank.close()
+    print(f"  withdraw+deposit       {ops / elapsed:>10,.0f} transfers/s")
+
+def batched(accounts, ops, batch_size):
+    with tempfile.TemporaryDirectory() as data_dir:
+        bank = BankSystem(data_dir, compact_every=ops * 2, password_hasher=PasswordHasher(iterations=1000))
+        ids = create_accounts(bank, accounts)
+        rng = random.Random(0)
+        rows = []
+        for _ in range(ops):
+            source, target = rng.sample(ids, 2)
+            rows.append({"id_number": source, "operation": "transfer", "to_id_number": target,
+                         "amount": rng.randint(1, 400)})
+        start = time.perf_counter()
+        applied, _ = bank.post_batch(rows, batch_size)
+        elapsed = time.perf_counter() - start
+        bank.close()
+    print(f"  batch of {batch_size:<6}        {ops / elapsed:>10,.0f} transfers/s  ({applied} applied)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress and time atomic transfers")
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000")
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=5000, help="transfers per run")
+    args = parser.parse_args()
+    print("Concurrent transfers (background journal, fsync per group commit)")
+    for threads in args.threads.split(","):
+        stress(int(threads), args.accounts, args.ops)
+    print("Sequential transfers")
+    paired(args.accounts, args.ops)
+    for batch_size in args.batch_sizes.split(","):
+        batched(args.accounts, args.ops, int(batch_size))
@@ -0,0 +1,90 @@
+# Async load generator for bank_server.py. Opens keep-alive connections, keeps
+# up to --pipeline requests in flight on each, and reports ops/sec with
+# p50/p99 latency for a mixed workload.
+#   python bank_server.py --data-dir /tmp/bank &
+#   python -m benchmarks.loadgen --connections 32 --pipeline 8 --requests 50000
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# login runs the password KDF; every other operation is authorized by session token
+WORKLOAD = [("deposit", 45), ("withdraw", 45), ("login", 8), ("apply_interest", 2)]
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def setup(host, port, accounts, prefix):
+    reader, writer = await asyncio.open_connection(host, port)
+    for i in range(accounts):
+        request = {"id": i, "op": "create_account", "id_number": f"{prefix}{i}", "name": f"Load {i}",
+                   "initial_deposit": 100000, "account_type": "Basic" if i % 2 else "Premium", "password": "load"}
+        writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    tokens = []
+    for _ in range(accounts):
+        tokens.append(json.loads(await reader.readline())["result"]["token"])
+    writer.close()
+    return tokens
+
+async def client(host, port, requests, pipeline, tokens, prefix, seed, latencies, errors):
+    rng = random.Random(seed)
+    operations = [op for op, weight in WORKLOAD for _ in range(weight)]
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = {}
+    window = asyncio.Semaphore(pipeline)
+
+    async def receive():
+        for _ in range(requests):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+            if not response["ok"]:
+                errors[response["error"]] = errors.get(response["error"], 0) + 1
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for i in range(requests):
+        await window.acquire()
+        op = rng.choice(operations)
+        account = rng.randrange(len(tokens))
+        if op == "login":
+            request = {"id": i, "op": op, "id_number": f"{prefix}{account}", "password": "load"}
+        else:
+            request = {"id": i, "op": op, "token": tokens[account]}
+        if op in ("deposit", "withdraw"):
+            request["amount"] = rng.randint(1, 1000)
+        sent_at[i] = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+    await receiver
+    writer.close()
+
+async def main(args):
+    prefix = f"load{int(time.time())}-"
+    tokens = await setup(args.host, args.port, args.accounts, prefix)
+    latencies = []
+    errors = {}
+    per_connection = args.requests // args.connections
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, per_connection, args.pipeline, tokens, prefix, seed, latencies, errors)
+        for seed in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connections (pipeline depth {args.pipeline})")
+    print(f"  throughput: {len(latencies) / elapsed:,.0f} ops/s")
+    print(f"  latency   : p50 {percentile(latencies, 0.50) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    for error, count in sorted(errors.items(), key=lambda item: -item[1]):
+        print(f"  rejected  : {count} x {error}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate load against bank_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--pipeline", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
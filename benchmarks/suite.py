@@ -0,0 +1,198 @@
+# Scenario benchmarks over synthetic books (benchmarks.workload) at several
+# scales: cold start (eager, and lazy up to the first deposit), deposit and
+# withdraw latency, snapshot save, login, interest, export and removal.
+# Results are written as JSON; compare flags the metrics that got slower
+# between two result files and exits non-zero if any did.
+#   python -m benchmarks.suite run --scales 1000,10000,100000 --output before.json
+#   python -m benchmarks.suite compare before.json after.json --threshold 0.10
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+import bank_export
+from bank_auth import PasswordHasher
+from bank_core import BankSystem, BankingException
+from benchmarks.workload import generate, password_for
+
+def elapsed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def latencies(function, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        try:
+            function(item)
+        except BankingException:
+            pass
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(results, name, samples):
+    samples = sorted(samples)
+    results[f"{name}.mean"] = statistics.fmean(samples)
+    results[f"{name}.p50"] = samples[len(samples) // 2]
+    results[f"{name}.p99"] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+@contextmanager
+def working_directory(path):
+    # export_transactions writes into the current directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def run_scale(scale, args, hasher):
+    results = {}
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        generate(os.path.join(data_dir, "bank_data.txt"), scale, args.premium, args.transactions, args.zipf,
+                 seed=args.seed)
+
+        def open_bank():
+            return BankSystem(data_dir, sync_policy=args.sync_policy, password_hasher=hasher)
+
+        start = time.perf_counter()
+        bank = open_bank()
+        results["cold_start.migrate"] = time.perf_counter() - start
+        bank.close()
+        starts = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            bank = open_bank()
+            starts.append(time.perf_counter() - start)
+            bank.close()
+        results["cold_start.snapshot"] = statistics.median(starts)
+        starts = []
+        for _ in range(args.repeat):
+            # Open without loading the accounts, then serve the first deposit
+            start = time.perf_counter()
+            bank = BankSystem(data_dir, sync_policy=args.sync_policy, password_hasher=hasher, lazy=True)
+            bank.deposit(bank.get_account("0"), 1.0)
+            starts.append(time.perf_counter() - start)
+            bank.close()
+        results["cold_start.lazy"] = statistics.median(starts)
+
+        bank = open_bank()
+        ids = list(bank.accounts)
+        targets = [bank.get_account(id_number) for id_number in rng.choices(ids, k=args.ops)]
+        summarize(results, "deposit", latencies(lambda account: bank.deposit(account, float(rng.randint(1, 500))), targets))
+        summarize(results, "withdraw", latencies(lambda account: bank.withdraw(account, float(rng.randint(1, 50))), targets))
+        bank.close()
+        start = time.perf_counter()
+        bank = open_bank()
+        results["cold_start.replay"] = time.perf_counter() - start
+        results["save_data"] = elapsed(bank.save_data)
+        targets = [bank.get_account(account.id_number) for account in targets]
+
+        # The generated hashes are legacy SHA-256, so the first login also
+        # re-hashes with the configured KDF; the second is a plain login
+        sample = rng.sample(ids, min(args.logins, len(ids)))
+        summarize(results, "login.upgrade", latencies(lambda id_number: bank.login(id_number, password_for(id_number)), sample))
+        summarize(results, "login", latencies(lambda id_number: bank.login(id_number, password_for(id_number)), sample))
+
+        results["interest.batch"] = elapsed(bank.apply_interest_batch, "bench-batch")
+        summarize(results, "interest.account",
+                  latencies(lambda account: bank.apply_interest(account, "bench-account"), targets[:args.ops // 2]))
+
+        with working_directory(data_dir):
+            summarize(results, "export.account", latencies(bank.export_transactions, targets[:args.exports]))
+        results["export.book"] = elapsed(bank_export.export_range, bank, os.path.join(data_dir, "book.csv"))
+
+        summarize(results, "remove", latencies(bank.remove_account, rng.sample(ids, min(args.ops, len(ids) // 2))))
+        bank.close()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    hasher = PasswordHasher(iterations=args.kdf_iterations)
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: value for key, value in vars(args).items() if key != "command"},
+        },
+        "results": {},
+    }
+    for scale in map(int, args.scales.split(",")):
+        print(f"{scale} accounts ...", file=sys.stderr)
+        # BankSystem reports the migration on stdout, which may be the JSON output
+        with redirect_stdout(sys.stderr):
+            results = report["results"][str(scale)] = run_scale(scale, args, hasher)
+        for name, seconds in results.items():
+            print(f"  {name:24} {seconds * 1e3:12.3f} ms", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def compare(args):
+    # Every metric is a duration, so a regression is a ratio above 1 + threshold;
+    # differences under min_delta seconds are treated as timer noise
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    print(f"{'scale':>8}  {'metric':24} {'base ms':>12} {'new ms':>12} {'change':>8}")
+    for scale in base:
+        for name, before in base[scale].items():
+            after = new.get(scale, {}).get(name)
+            if after is None:
+                continue
+            change = after / before - 1 if before else 0.0
+            regressed = change > args.threshold and after - before > args.min_delta
+            regressions += regressed
+            print(f"{scale:>8}  {name:24} {before * 1e3:12.3f} {after * 1e3:12.3f} {change:+8.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or compare the banking benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run every scenario at each scale")
+    run_parser.add_argument("--scales", default="1000,10000,100000", help="comma-separated account counts")
+    run_parser.add_argument("--output", help="JSON results file (default: stdout)")
+    run_parser.add_argument("--ops", type=int, default=200, help="samples per single-operation scenario")
+    run_parser.add_argument("--logins", type=int, default=10)
+    run_parser.add_argument("--exports", type=int, default=20)
+    run_parser.add_argument("--repeat", type=int, default=3, help="cold starts per scale (median is reported)")
+    run_parser.add_argument("--premium", type=float, default=0.25, help="share of Premium accounts")
+    run_parser.add_argument("--transactions", type=int, default=10, help="mean transactions per account")
+    run_parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of account activity")
+    run_parser.add_argument("--sync-policy", default="always", choices=["always", "group", "interval"])
+    run_parser.add_argument("--kdf-iterations", type=int, default=260000, help="PBKDF2 iterations for login")
+    run_parser.add_argument("--seed", type=int, default=42)
+    compare_parser = commands.add_parser("compare", help="flag metrics that regressed between two runs")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown ratio")
+    compare_parser.add_argument("--min-delta", type=float, default=0.0001, help="ignore differences under this many seconds")
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
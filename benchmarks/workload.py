@@ -0,0 +1,81 @@
+# Deterministic synthetic bank book in the bank_data.txt format (one account
+# dict per line). Account activity follows a Zipf law, so a few accounts carry
+# most of the history as in a real book; the same seed always writes the same
+# file. Every password is password_for(id_number).
+#   python -m benchmarks.workload bank_data.txt --accounts 100000 --premium 0.25 --zipf 1.1
+import argparse
+import hashlib
+import itertools
+import random
+from datetime import datetime, timedelta
+
+START = datetime(2024, 1, 1)
+
+def password_for(id_number):
+    return f"pw-{id_number}"
+
+def zipf_weights(count, exponent):
+    # Cumulative weights of ranks 1..count for random.choices
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+def activity(rng, accounts, transactions, exponent):
+    # Transactions per account after the initial deposit: each transaction goes
+    # to a Zipf-drawn rank, and ranks are shuffled over the accounts
+    counts = [0] * accounts
+    for rank in rng.choices(range(accounts), cum_weights=zipf_weights(accounts, exponent), k=transactions):
+        counts[rank] += 1
+    rng.shuffle(counts)
+    return counts
+
+def history(rng, balance, count, days):
+    # Sorted timestamps over the window; withdrawals that would break the
+    # 100 HUF floor become deposits, so every history replays cleanly
+    timestamps = [(START + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S")
+                  for offset in sorted(rng.randrange(days * 86400) for _ in range(count + 1))]
+    log = [{"type": "Deposit", "amount": balance, "timestamp": timestamps[0], "description": "Initial Deposit"}]
+    for timestamp in timestamps[1:]:
+        amount = float(rng.randint(1, 2000))
+        if rng.random() < 0.4 and balance - amount >= 100:
+            balance -= amount
+            log.append({"type": "Withdrawal", "amount": -amount, "timestamp": timestamp, "description": "Withdrawal"})
+        else:
+            balance += amount
+            log.append({"type": "Deposit", "amount": amount, "timestamp": timestamp, "description": "Deposit"})
+    return round(balance, 2), log
+
+def generate(path, accounts, premium=0.25, transactions_per_account=10, exponent=1.1, days=365, seed=42):
+    # Returns the total number of transactions written, initial deposits included
+    if accounts > 900000:
+        raise ValueError("At most 900000 accounts fit the 6-digit account numbers")
+    rng = random.Random(seed)
+    counts = activity(rng, accounts, accounts * (transactions_per_account - 1), exponent)
+    numbers = rng.sample(range(100000, 1000000), accounts)
+    with open(path, "w") as f:
+        for i, (count, number) in enumerate(zip(counts, numbers)):
+            id_number = str(i)
+            balance, log = history(rng, float(rng.randint(1000, 100000)), count, days)
+            f.write(str({
+                "id_number": id_number,
+                "name": f"Customer {i}",
+                "balance": balance,
+                "account_number": number,
+                "account_type": "Premium" if rng.random() < premium else "Basic",
+                "password_hash": hashlib.sha256(password_for(id_number).encode()).hexdigest(),
+                "transaction_log": log,
+                "failed_withdrawals": 0,
+                "is_locked": False
+            }) + "\n")
+    return accounts + sum(counts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic bank_data.txt")
+    parser.add_argument("path")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--premium", type=float, default=0.25, help="share of Premium accounts")
+    parser.add_argument("--transactions", type=int, default=10, help="mean transactions per account")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of account activity")
+    parser.add_argument("--days", type=int, default=365, help="length of the history from 2024-01-01")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    total = generate(args.path, args.accounts, args.premium, args.transactions, args.zipf, args.days, args.seed)
+    print(f"Wrote {args.accounts} accounts and {total} transactions to {args.path}")